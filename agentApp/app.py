@@ -1,5 +1,7 @@
+import argparse
 import asyncio
 import logging
+import os
 from dotenv import load_dotenv
 from pathlib import Path
 import sys
@@ -9,15 +11,46 @@ sys.path.append(str(Path(__file__).parent))
 from weather_agent import WeatherAgent
 from config import configure_logging
 
+# Módulos compartilhados ficam em src/server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+from console import ainput, read_queries, run_batch
+
 load_dotenv()
 configure_logging()
 
-async def main():
-    agent = WeatherAgent(
+async def imprimir_resposta(agent, query):
+    # Mostra os tokens conforme chegam, em vez de esperar a resposta inteira
+    print("\nAssistente: ", end="", flush=True)
+    streamed = False
+    async for event in agent.chat_stream(query):
+        if event["type"] == "text":
+            streamed = True
+            print(event["delta"], end="", flush=True)
+        elif event["type"] == "tool_call":
+            print(f"[{event['name']}...] ", end="", flush=True)
+        elif event["type"] == "done" and not streamed:
+            print(event["output"], end="")
+    print()
+
+def criar_agente() -> WeatherAgent:
+    return WeatherAgent(
         user_name="Arthur",
         default_location="Jundiai",
         preferences={"temperature_unit": "celsius"}
     )
+
+async def criar_sessao() -> WeatherAgent:
+    agent = criar_agente()
+    await agent.initialize()
+    return agent
+
+async def batch(path: str, concurrency: int):
+    # Modo batch: todas as perguntas do arquivo em paralelo sobre um pool de sessões
+    for query, response in await run_batch(read_queries(path), criar_sessao, concurrency):
+        print(f"\nVocê: {query}\nAssistente: {response}")
+
+async def main():
+    agent = criar_agente()
     
     try:
         await agent.initialize()
@@ -25,17 +58,17 @@ async def main():
         
         while True:
             try:
-                query = input("\nVocê: ").strip()
+                # Lê o stdin numa thread: o loop segue atendendo o servidor MCP enquanto o usuário digita
+                query = (await ainput("\nVocê: ")).strip()
                 if query.lower() in ('sair', 'exit', 'quit'):
                     break
                     
                 if not query:
                     continue
                     
-                response = await agent.chat(query)
-                print("\nAssistente:", response)
+                await imprimir_resposta(agent, query)
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\nEncerrando a sessão...")
                 break
             except Exception as e:
@@ -49,4 +82,8 @@ async def main():
         print("Sessão encerrada. Até logo!")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Assistente climático")
+    parser.add_argument("--batch", metavar="FILE", help="arquivo com uma pergunta por linha")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessões em paralelo no modo batch")
+    args = parser.parse_args()
+    asyncio.run(batch(args.batch, args.concurrency) if args.batch else main())
\ No newline at end of file
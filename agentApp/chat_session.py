@@ -1,7 +1,18 @@
 import logging
-from agents import Agent, Runner, gen_trace_id, trace
+import os
+import sys
+import time
+from agents import Agent, RunConfig, Runner, gen_trace_id
 from agents.model_settings import ModelSettings
 
+# Módulos compartilhados ficam em src/server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+from chat_history import ChatHistory
+from metrics import TokenUsage
+
+# Orçamento de tokens do histórico incluído nas instruções
+HISTORY_MAX_TOKENS = 1000
+
 class BaseChatSession:
     def __init__(self):
         self.server_params = {
@@ -15,31 +26,82 @@ class BaseChatSession:
             max_tokens=2000
         )
         self.agent = None
-        self.conversation_history = []
+        self.conversation_history = ChatHistory(max_tokens=HISTORY_MAX_TOKENS)
         self.user_context = {}
+        self.token_usage = TokenUsage()
     
     async def chat(self, query: str) -> str:
+        response = ""
+        async for event in self.chat_stream(query):
+            if event["type"] == "done":
+                response = event["output"]
+        return response
+
+    async def chat_stream(self, query: str):
+        """Versão em streaming do chat().
+
+        Gera eventos conforme chegam do modelo:
+          {"type": "text", "delta": str}          pedaço da resposta
+          {"type": "tool_call", "name": str}      ferramenta chamada
+          {"type": "tool_output", "output": str}  resultado da ferramenta
+          {"type": "done", "output": str}         resposta final (último evento)
+        O histórico só recebe a resposta quando o stream termina.
+        """
         self._update_history("user", query)
+        started = time.perf_counter()
+        first_token = None
         
-        with trace("Agent interaction", trace_id=gen_trace_id()):
-            try:
-                if self.agent:
-                    self.agent.instructions = self._build_instructions()
-                
-                result = await Runner.run(self.agent, query)
-                response = result.final_output
-                self._update_history("assistant", response)
-                return response
-            except Exception as e:
-                logging.error(f"Erro na conversação: {str(e)}")
-                error_msg = "Desculpe, ocorreu um erro."
-                self._update_history("system", error_msg)
-                return error_msg
+        result = None
+        try:
+            if self.agent:
+                self.agent.instructions = self._build_instructions()
+            
+            # O trace fica a cargo do Runner (um `with trace` atravessando os
+            # yields quebra se o consumidor parar no meio)
+            run_config = RunConfig(workflow_name="Agent interaction", trace_id=gen_trace_id())
+            result = Runner.run_streamed(self.agent, query, run_config=run_config)
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if event.data.type == "response.output_text.delta" and event.data.delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                            logging.info(f"Primeiro token em {first_token * 1000:.0f} ms")
+                        yield {"type": "text", "delta": event.data.delta}
+                elif event.type == "run_item_stream_event":
+                    if event.name == "tool_called":
+                        raw = event.item.raw_item
+                        yield {"type": "tool_call", "name": getattr(raw, "name", None) or getattr(raw, "type", "ferramenta")}
+                    elif event.name == "tool_output":
+                        yield {"type": "tool_output", "output": str(event.item.output)}
+            
+            response = str(result.final_output)
+            logging.info(f"Resposta completa em {(time.perf_counter() - started) * 1000:.0f} ms")
+            self._log_usage(result.context_wrapper.usage)
+        except Exception as e:
+            logging.error(f"Erro na conversação: {str(e)}")
+            response = "Desculpe, ocorreu um erro."
+            self._update_history("system", response)
+            yield {"type": "done", "output": response}
+            return
+        finally:
+            # Consumidor parou no meio: interrompe a execução do agente
+            if result is not None and not result.is_complete:
+                result.cancel()
+        
+        self._update_history("assistant", response)
+        yield {"type": "done", "output": response}
+    
+    def _log_usage(self, usage):
+        # Quanto da entrada veio do cache de prompt do provedor neste turno
+        turn = self.token_usage.add(usage)
+        total = self.token_usage.summary()
+        logging.info(
+            f"Tokens de entrada: {turn['input']} ({turn['cached']} em cache, {turn['uncached']} sem cache), "
+            f"saída: {turn['output']} | sessão: {total['cache_rate']:.0%} da entrada em cache"
+        )
     
     def _update_history(self, role: str, message: str):
-        self.conversation_history.append((role, message.strip()))
-        if len(self.conversation_history) > 10:
-            self.conversation_history.pop(0)
+        self.conversation_history.append(role, message.strip())
     
     async def close(self):
         if hasattr(self, 'mcp_server'):
@@ -3,6 +3,14 @@ from chat_session import BaseChatSession
 from agents import Agent, Runner, WebSearchTool, gen_trace_id, trace
 from agents.mcp import MCPServerStdio
 
+GUIDELINES = (
+    "Diretrizes:\n"
+    "- Seja conciso mas informativo\n"
+    "- Use emojis quando apropriado\n"
+    "- Sempre resuma pesquisas web\n"
+    "- Verifique dados com ferramentas quando necessário"
+)
+
 class WeatherAgent(BaseChatSession):
     def __init__(self, user_name: str, default_location: str, preferences: dict):
         super().__init__()
@@ -11,6 +19,7 @@ class WeatherAgent(BaseChatSession):
             "location": default_location,
             "preferences": preferences
         }
+        self._base_instructions = None
     
     async def initialize(self):
         self.mcp_server = await MCPServerStdio(params=self.server_params).__aenter__()
@@ -28,28 +37,22 @@ class WeatherAgent(BaseChatSession):
         )
     
     def _build_instructions(self) -> str:
-        base_instructions = (
-            "Você é um assistente chatbot conciso e direto especializado em clima. "
-            "Forneça informações meteorológicas precisas e pesquisas na web quando necessário.\n\n"
-            "Contexto do usuário:\n"
-            f"- Nome: {self.user_context['name']}\n"
-            f"- Localização padrão: {self.user_context['location']}\n"
-            f"- Preferências: {self.user_context['preferences']['temperature_unit']}\n\n"
-        )
-        
-        if self.conversation_history:
-            base_instructions += "Últimas interações:\n"
-            for i, (role, msg) in enumerate(self.conversation_history[-3:], 1):
-                base_instructions += f"{i}. {role}: {msg}\n"
-            base_instructions += "\n"
-        
-        base_instructions += (
-            f"Data e hora atual: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            "Diretrizes:\n"
-            "- Seja conciso mas informativo\n"
-            "- Use emojis quando apropriado\n"
-            "- Sempre resuma pesquisas web\n"
-            "- Verifique dados com ferramentas quando necessário"
-        )
+        # Prefixo estável (persona, contexto do usuário e diretrizes) montado uma
+        # vez e idêntico em todo turno, para o cache de prompt do provedor; o que
+        # muda a cada turno (histórico e horário) vai sempre no final
+        if self._base_instructions is None:
+            self._base_instructions = (
+                "Você é um assistente chatbot conciso e direto especializado em clima. "
+                "Forneça informações meteorológicas precisas e pesquisas na web quando necessário.\n\n"
+                "Contexto do usuário:\n"
+                f"- Nome: {self.user_context['name']}\n"
+                f"- Localização padrão: {self.user_context['location']}\n"
+                f"- Preferências: {self.user_context['preferences']['temperature_unit']}\n\n"
+                f"{GUIDELINES}\n\n"
+            )
         
-        return base_instructions
\ No newline at end of file
+        return "".join((
+            self._base_instructions,
+            self.conversation_history.render() if self.conversation_history else "",
+            f"Data e hora atual: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        ))
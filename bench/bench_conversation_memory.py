@@ -0,0 +1,74 @@
+"""Memória do histórico de conversas com 10k chats: dict de listas vs ConversationStore.
+
+Simula `--chats` chats trocando `--messages` mensagens cada (intercaladas,
+como no webhook) e mede com tracemalloc a memória retida pelo antigo
+`conversation_history = {}` (listas que só crescem) e pelo ConversationStore
+com os limites padrão do webhookserver.
+
+    python bench/bench_conversation_memory.py --chats 10000 --messages 50
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+from conversation_store import ConversationStore
+
+
+def traffic(chats, messages, size, seed=42):
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz     "
+    for i in range(messages):
+        for chat in range(chats):
+            # Textos novos a cada mensagem, como numa conversa real
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(size // 2, size * 2)))
+            yield f"55119{chat:08d}@c.us", ("User" if i % 2 == 0 else "Assistant"), text
+
+
+def measure(label, chats, messages, size, build, append, read):
+    items = list(traffic(chats, messages, size))
+    tracemalloc.start()
+    store = build()
+    for chat_id, role, text in items:
+        append(store, chat_id, role, text)
+        read(store, chat_id)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:22s} {current / 1024 / 1024:8.1f} MiB retidos")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--size", type=int, default=120, help="tamanho médio das mensagens")
+    parser.add_argument("--max-bytes", type=int, default=16 * 1024 * 1024)
+    args = parser.parse_args()
+
+    def dict_append(history, chat_id, role, text):
+        if chat_id not in history:
+            history[chat_id] = []
+        history[chat_id].append((role, text))
+
+    measure(
+        "dict de listas", args.chats, args.messages, args.size,
+        dict, dict_append, lambda history, chat_id: history[chat_id][-3:],
+    )
+    store = measure(
+        "ConversationStore", args.chats, args.messages, args.size,
+        lambda: ConversationStore(max_messages=10, ttl=24 * 3600, max_bytes=args.max_bytes),
+        lambda store, chat_id, role, text: store.append(chat_id, role, text),
+        lambda store, chat_id: store.history(chat_id, 3),
+    )
+    stats = store.stats()
+    print(
+        f"ConversationStore: {stats['chats']} chats, {stats['messages']} mensagens, "
+        f"estimativa {stats['bytes'] / 1024 / 1024:.1f} MiB, {stats['evicted_chats']} chats descartados"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Compara o webhook do webhookserver com asyncio.run por requisição vs loop compartilhado.
+
+Dispara mensagens contra o /webhook real (src/server/webhookserver.py, via
+test_client do Flask, de várias threads) com o modelo trocado por um falso
+que lista as ferramentas do servidor MCP (como o Runner faz a cada execução)
+e espera `--model-ms`. O servidor MCP é um subprocesso stdio de verdade (um
+FastMCP mínimo) e o WAHA é um servidor HTTP local que conta os envios.
+
+- asyncio.run por requisição (como era antes): cada mensagem roda num loop
+  novo, dentro da requisição, abrindo o seu próprio servidor MCP e as suas
+  conexões com o WAHA.
+- loop compartilhado (atual): o webhook só enfileira; os workers usam o pool
+  MCP quente e o cliente WAHA com keep-alive.
+
+Mostra requisições/s do webhook e mensagens/s até a última resposta chegar ao
+WAHA. Todas as mensagens vêm do chat autorizado (o único que o webhookserver
+responde), então no modo atual elas saem em ordem, uma de cada vez.
+
+    python bench/bench_event_loop.py --requests 100 --threads 8 --model-ms 20
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+from agents import set_tracing_disabled
+from agents.mcp import MCPServerStdio
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src", "server"))
+
+FAKE_MCP_SERVER = """
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("bench", log_level="WARNING")
+
+
+@mcp.tool()
+def ping() -> str:
+    return "pong"
+
+
+mcp.run()
+"""
+
+
+class FakeWaha(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    sent = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/sendText":
+            with FakeWaha.lock:
+                FakeWaha.sent += 1
+        body = json.dumps({"id": "ok"}).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PerRequestLoop:
+    """Como o webhook fazia antes: um asyncio.run por chamada, na thread da requisição"""
+
+    def submit(self, coro):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(asyncio.run(coro))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, coro, timeout=None):
+        return asyncio.run(coro)
+
+
+class PerRequestQueue:
+    """Sem fila: processa a mensagem inteira dentro da requisição"""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def submit(self, chat_id, job):
+        asyncio.run(self.handler(job))
+        return True
+
+
+class PerRequestMCP:
+    """Sem pool: um subprocesso MCP novo por mensagem"""
+
+    def __init__(self, params):
+        self.params = params
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with MCPServerStdio(params=self.params) as server:
+            yield server
+
+
+def per_request_waha(base_url):
+    from waha import AsyncWahaClient
+
+    class PerCallWaha(AsyncWahaClient):
+        """Uma conexão nova por chamada (não dá para manter cliente entre loops)"""
+
+        async def post(self, path, payload):
+            async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout) as http:
+                response = await http.post(path, json={"session": self.session, **payload})
+                response.raise_for_status()
+                return response.json()
+
+    return PerCallWaha(base_url)
+
+
+def fire(webhookserver, n, threads):
+    """Dispara n mensagens do chat autorizado; devolve (req/s, msg/s até a última resposta)"""
+    FakeWaha.sent = 0
+    local = threading.local()
+
+    def post(i):
+        client = getattr(local, "client", None) or webhookserver.app.test_client()
+        local.client = client
+        payload = {"from": webhookserver.autorized, "body": f"mensagem {i}", "id": f"id-{i}"}
+        response = client.post("/webhook", json={"event": "message", "payload": payload})
+        assert response.status_code == 200, response.status_code
+
+    # O webhook imprime cada mensagem; durante a medição isso só atrapalha
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+            list(pool.map(post, range(n)))
+        accepted = time.perf_counter() - started
+        deadline = time.monotonic() + 300
+        while FakeWaha.sent < n and time.monotonic() < deadline:
+            time.sleep(0.005)
+        done = time.perf_counter() - started
+    return n / accepted, FakeWaha.sent / done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--model-ms", type=float, default=20.0, help="latência do modelo falso")
+    args = parser.parse_args()
+
+    waha_server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWaha)
+    threading.Thread(target=waha_server.serve_forever, daemon=True).start()
+    waha_url = f"http://127.0.0.1:{waha_server.server_port}"
+
+    workdir = tempfile.mkdtemp()
+    script = os.path.join(workdir, "fake_mcp_server.py")
+    with open(script, "w") as f:
+        f.write(FAKE_MCP_SERVER)
+    params = {"command": sys.executable, "args": [script]}
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    set_tracing_disabled(True)
+    import webhookserver
+    from job_queue import JobQueue
+    from mcp_pool import MCPServerPool
+    from waha import AsyncWahaClient
+
+    async def fake_run(agent, message, context=None):
+        for server in agent.mcp_servers:
+            await server.list_tools()
+        await asyncio.sleep(args.model_ms / 1000)
+        usage = SimpleNamespace(total_tokens=0)
+        return SimpleNamespace(final_output=f"eco {message}", context_wrapper=SimpleNamespace(usage=usage))
+
+    webhookserver.Runner = SimpleNamespace(run=fake_run)
+    shared_loop = webhookserver.background
+
+    # asyncio.run por requisição
+    webhookserver.background = PerRequestLoop()
+    webhookserver.job_queue = PerRequestQueue(webhookserver.handle_message)
+    webhookserver.mcp_pool = PerRequestMCP(params)
+    webhookserver.waha = per_request_waha(waha_url)
+    old_req, old_msg = fire(webhookserver, args.requests, args.threads)
+
+    # Loop compartilhado: pool MCP quente, cliente WAHA único e fila (sem o
+    # limite por contato, que aqui só mediria o próprio limite)
+    pool = MCPServerPool(params)
+    webhookserver.background = shared_loop
+    webhookserver.mcp_pool = pool
+    webhookserver.waha = AsyncWahaClient(waha_url)
+    webhookserver.job_queue = JobQueue(
+        webhookserver.handle_message, shared_loop, workers=pool.size, maxsize=args.requests, per_chat=args.requests
+    )
+    shared_loop.run(pool.start())  # servidores sobem antes, como no primeiro uso do servidor real
+    new_req, new_msg = fire(webhookserver, args.requests, args.threads)
+    shared_loop.run(webhookserver.job_queue.close())
+    shared_loop.run(pool.close())
+    shared_loop.run(webhookserver.waha.aclose())
+    shared_loop.stop()
+    waha_server.shutdown()
+
+    print(f"asyncio.run por requisição: webhook {old_req:8.1f} req/s | respostas {old_msg:7.1f} msg/s")
+    print(f"loop compartilhado:         webhook {new_req:8.1f} req/s | respostas {new_msg:7.1f} msg/s "
+          f"({new_req / old_req:.0f}x / {new_msg / old_msg:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
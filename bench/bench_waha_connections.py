@@ -0,0 +1,122 @@
+"""Conta conexões TCP abertas no WAHA por resposta enviada.
+
+Sobe um WAHA falso local (HTTP/1.1 com keep-alive) que conta as conexões
+aceitas e simula N respostas completas (seen, startTyping, sendText,
+stopTyping) com requests.post puro, com WahaClient e com AsyncWahaClient.
+
+    python bench/bench_waha_connections.py --replies 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+from waha import AsyncWahaClient, WahaClient
+
+
+class StubWaha(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Resposta em um único segmento TCP (evita o atraso de ACK do Nagle)
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    connections = 0
+    requests = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubWaha.lock:
+            StubWaha.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with StubWaha.lock:
+            StubWaha.requests += 1
+        body = json.dumps({"id": "ok"}).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def reset():
+    StubWaha.connections = 0
+    StubWaha.requests = 0
+
+
+def bare_reply(base_url, chat_id):
+    # Como o webhook fazia antes: um requests.post (e uma conexão) por chamada
+    requests.post(f"{base_url}/api/sendSeen", json={"session": "default", "chatId": chat_id, "messageId": "x", "participant": None})
+    requests.post(f"{base_url}/api/startTyping", json={"session": "default", "chatId": chat_id})
+    requests.post(f"{base_url}/api/sendText", json={"session": "default", "chatId": chat_id, "text": "oi"})
+    requests.post(f"{base_url}/api/stopTyping", json={"session": "default", "chatId": chat_id})
+
+
+def sync_reply(client, chat_id):
+    client.send_seen(chat_id, "x", None)
+    client.start_typing(chat_id)
+    client.send_message(chat_id, "oi")
+    client.stop_typing(chat_id)
+
+
+async def async_reply(client, chat_id):
+    async with client.typing_indicator(chat_id, "x", None):
+        await client.send_message(chat_id, "oi")
+
+
+def report(name, replies, elapsed):
+    print(f"{name:<18} {StubWaha.connections / replies:6.2f} conexões/resposta  "
+          f"{StubWaha.requests / replies:4.1f} req/resposta  {replies / elapsed:8.1f} respostas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replies", type=int, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWaha)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    chat_id = "5519999999999@c.us"
+
+    reset()
+    started = time.perf_counter()
+    for _ in range(args.replies):
+        bare_reply(base_url, chat_id)
+    report("requests.post", args.replies, time.perf_counter() - started)
+
+    reset()
+    client = WahaClient(base_url)
+    started = time.perf_counter()
+    for _ in range(args.replies):
+        sync_reply(client, chat_id)
+    report("WahaClient", args.replies, time.perf_counter() - started)
+    client.close()
+
+    async def run_async():
+        client = AsyncWahaClient(base_url)
+        started = time.perf_counter()
+        for _ in range(args.replies):
+            await async_reply(client, chat_id)
+        elapsed = time.perf_counter() - started
+        await client.aclose()
+        return elapsed
+
+    reset()
+    report("AsyncWahaClient", args.replies, asyncio.run(run_async()))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Latência p50/p99 da ferramenta fetch_weather com e sem cliente HTTP compartilhado.
+
+Sobe um OpenWeather falso local e chama a ferramenta do servidor MCP
+(src/server/server.py) com o cache desligado, primeiro criando um
+httpx.AsyncClient por chamada (comportamento antigo) e depois reaproveitando
+o cliente do lifespan.
+
+    python bench/bench_weather_tool.py --calls 300
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+WEATHER = {
+    "main": {"temp": 21.5, "humidity": 60},
+    "weather": [{"description": "céu limpo"}],
+    "wind": {"speed": 2.1},
+}
+
+
+class FakeOpenWeather(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps(WEATHER).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PerCallClient:
+    """Como as ferramentas faziam antes: um AsyncClient novo por chamada"""
+
+    async def get(self, *args, **kwargs):
+        async with httpx.AsyncClient() as client:
+            return await client.get(*args, **kwargs)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000)
+
+
+async def measure(server, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await server.fetch_weather("Jundiai")
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenWeather)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    os.environ["OPENWEATHER_URL"] = f"http://127.0.0.1:{upstream.server_port}"
+    os.environ["WEATHER_CACHE_SIZE"] = "0"  # toda chamada vai ao upstream
+    os.environ.pop("WEATHER_CACHE_FILE", None)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+    import http_client
+    import server
+    import weather
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def run():
+        weather.get_client = lambda: PerCallClient()
+        before = await measure(server, args.calls)
+
+        async with server.lifespan(server.mcp):
+            weather.get_client = http_client.get_client
+            after = await measure(server, args.calls)
+        return before, after
+
+    before, after = asyncio.run(run())
+    print(f"cliente por chamada:   p50 {before[0]:6.2f} ms  p99 {before[1]:6.2f} ms")
+    print(f"cliente compartilhado: p50 {after[0]:6.2f} ms  p99 {after[1]:6.2f} ms")
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Teste de carga do webhook do whatsserver: reenvia o messages.log com modelo e WAHA falsos.
+
+Roda o whatsserver/app.py num diretório temporário (config, contatos e log
+próprios), troca o responder_whatsapp por um modelo falso com latência
+configurável e o cliente WAHA por um que só registra os envios. As mensagens
+do log são disparadas contra o webhook por várias threads (cada chat envia as
+suas em ordem, chats diferentes ao mesmo tempo).
+
+Para cada número de workers informado mostra vazão, latência ponta a ponta
+(webhook -> resposta enviada), paralelismo atingido, recusas (503) e confere
+que cada chat recebeu as respostas na mesma ordem em que mandou.
+
+    python bench/load_test.py whatsserver/messages.log --workers 1,4,8 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, redirect_stdout
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_chats(log_path, limit=None):
+    """Mensagens do log agrupadas por chat, na ordem original"""
+    chats = defaultdict(list)
+    total = 0
+    with open(log_path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except Exception:
+                continue
+            sender, text = entry.get("from") or "", entry.get("user_message") or ""
+            if not sender or not text:
+                continue
+            chat_id = sender if "@" in sender else f"{sender}@c.us"
+            chats[chat_id].append((entry.get("from_name") or "Desconhecido", text))
+            total += 1
+            if limit and total >= limit:
+                break
+    return chats
+
+
+class FakeWaha:
+    """Cliente WAHA falso: só registra o que seria enviado"""
+
+    def __init__(self):
+        self.sent = defaultdict(list)  # chat_id -> [texto]
+        self.sent_at = {}  # texto -> instante do envio
+
+    @asynccontextmanager
+    async def typing_indicator(self, chat_id, message_id=None, participant=None, refresh=None):
+        yield
+
+    async def send_message(self, chat_id, text):
+        self.sent[chat_id].append(text)
+        self.sent_at[text] = time.perf_counter()
+
+    async def send_seen(self, *args, **kwargs):
+        pass
+
+    async def acknowledge(self, *args, **kwargs):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+def setup_app(workdir, chats):
+    with open(os.path.join(workdir, "config.txt"), "w") as f:
+        f.write("enable_responses=true\n")
+    with open(os.path.join(workdir, "allowed_contacts.txt"), "w") as f:
+        for chat_id in chats:
+            number = chat_id.split("@")[0]
+            f.write(f"{number},{number},true\n")
+    os.chdir(workdir)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-load-test")
+    sys.path.insert(0, os.path.join(ROOT, "whatsserver"))
+    import app
+    return app
+
+
+def run(app, chats, workers, clients, latency, jitter, per_chat, maxsize):
+    from job_queue import JobQueue
+
+    waha = FakeWaha()
+    app.waha = waha
+
+    async def modelo_falso(mensagem, nome_remetente, chat_id):
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+        return f"eco {chat_id} {mensagem}"
+
+    app.responder_whatsapp = modelo_falso
+    app.job_queue = JobQueue(app.processar_mensagem, app.background, workers=workers, maxsize=maxsize, per_chat=per_chat)
+
+    accepted_at = {}
+    expected = defaultdict(list)
+    retries = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def replay(chat_id):
+        nonlocal retries
+        client = getattr(local, "client", None) or app.app.test_client()
+        local.client = client
+        for i, (name, text) in enumerate(chats[chat_id]):
+            # Mensagem única por chat para casar a resposta com o envio
+            body = f"{i}: {text}"
+            payload = {"event": "message", "payload": {"from": chat_id, "body": body, "id": f"{chat_id}-{i}", "pushName": name}}
+            while True:
+                started = time.perf_counter()
+                response = client.post("/webhook", json=payload)
+                if response.status_code != 503:
+                    break
+                with lock:
+                    retries += 1
+                time.sleep(0.05)
+            with lock:
+                accepted_at[f"🤖: eco {chat_id} {body}"] = started
+                expected[chat_id].append(f"🤖: eco {chat_id} {body}")
+
+    total = sum(len(messages) for messages in chats.values())
+    # O app imprime cada webhook; durante a carga isso só atrapalha
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(replay, list(chats)))
+        deadline = time.monotonic() + 60 + total * latency
+        while sum(len(texts) for texts in waha.sent.values()) < total and time.monotonic() < deadline:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        app.background.run(app.job_queue.close())
+
+    latencies = sorted(waha.sent_at[text] - accepted_at[text] for text in accepted_at if text in waha.sent_at)
+    out_of_order = [chat_id for chat_id in expected if waha.sent[chat_id] != expected[chat_id]]
+    stats = app.job_queue.stats()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(
+        f"workers={workers:<3d} {total} msgs de {len(chats)} chats em {elapsed:6.2f}s "
+        f"({total / elapsed:6.1f} msg/s) | ponta a ponta p50 {p(0.5):7.0f} ms p95 {p(0.95):7.0f} ms "
+        f"| paralelo máx {stats['max_active']} | 503 {retries} | fora de ordem {len(out_of_order)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", nargs="?", default=os.path.join(ROOT, "whatsserver", "messages.log"))
+    parser.add_argument("--workers", default="1,4,8", help="lista de workers a testar (ex.: 1,4,8)")
+    parser.add_argument("--clients", type=int, default=16, help="threads disparando webhooks")
+    parser.add_argument("--latency", type=float, default=0.3, help="latência média do modelo falso (s)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--limit", type=int, default=None, help="máximo de mensagens do log")
+    parser.add_argument("--per-chat", type=int, default=10)
+    parser.add_argument("--maxsize", type=int, default=100)
+    args = parser.parse_args()
+
+    chats = load_chats(os.path.abspath(args.log), args.limit)
+    if not chats:
+        print("Nenhuma mensagem de usuário no log.")
+        return
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as workdir:
+        app = setup_app(workdir, chats)
+        for workers in (int(w) for w in args.workers.split(",")):
+            run(app, chats, workers, args.clients, args.latency, args.jitter, args.per_chat, args.maxsize)
+        app.background.stop()
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main()
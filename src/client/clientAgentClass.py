@@ -1,4 +1,6 @@
+import argparse
 import os
+import sys
 import openai
 import asyncio
 from datetime import datetime
@@ -8,6 +10,11 @@ from agents.mcp import MCPServerStdio
 from agents.model_settings import ModelSettings
 import logging
 
+# Módulos compartilhados ficam em src/server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from chat_history import ChatHistory
+from console import ainput, read_queries, run_batch
+
 # Configuração
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +22,24 @@ logger = logging.getLogger(__name__)
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Orçamento de tokens do histórico incluído nas instruções
+HISTORY_MAX_TOKENS = 1000
+
+BASE_INSTRUCTIONS = (
+    "Você é um assistente chatbot conciso e direto. "
+    "Seu objetivo é fornecer informações sucintas de clima e tempo precisas, voce pode pesquisar sobre qualquer coisa na internet, "
+    "Sempre que possível, use ferramentas para obter dados atualizados e sempre resuma a resposta para o usuario.\n\n"
+)
+
+FINAL_INSTRUCTIONS = (
+    "Diretrizes importantes:\n"
+    "- Se o usuário perguntar sobre clima sem especificar localização, "
+    "use a localização padrão se disponível.\n"
+    "- Para previsões, sempre especifique a fonte dos dados.\n"
+    "- Mantenha respostas claras e informativas.\n"
+    "- Use emojis relevantes quando apropriado para melhorar a experiência."
+)
+
 class ChatSession:
     def __init__(self):
         self.server_params = {
@@ -28,7 +53,7 @@ class ChatSession:
             max_tokens=2000
         )
         self.agent = None
-        self.conversation_history = []
+        self.conversation_history = ChatHistory(max_tokens=HISTORY_MAX_TOKENS)
         self.user_context = {
             "name": None,  #personal
             "location": None, #personal
@@ -55,52 +80,22 @@ class ChatSession:
     
     def _build_instructions(self) -> str:
         """Constroi as instruções dinâmicas incluindo contexto e histórico"""
-        base_instructions = (
-            "Você é um assistente chatbot conciso e direto. "
-            "Seu objetivo é fornecer informações sucintas de clima e tempo precisas, voce pode pesquisar sobre qualquer coisa na internet, "
-            "Sempre que possível, use ferramentas para obter dados atualizados e sempre resuma a resposta para o usuario.\n\n"
-        )
-        
         # Adiciona contexto do usuário
-        context_section = "Contexto do usuário:\n"
+        context_lines = ["Contexto do usuário:\n"]
         if self.user_context["name"]:
-            context_section += f"- Nome: {self.user_context['name']}\n"
+            context_lines.append(f"- Nome: {self.user_context['name']}\n")
         if self.user_context["location"]:
-            context_section += f"- Localização padrão: {self.user_context['location']}\n"
-        context_section += (
-            f"- Preferências: {self.user_context['preferences']['temperature_unit']}, "
-            
-        )
+            context_lines.append(f"- Localização padrão: {self.user_context['location']}\n")
+        context_lines.append(f"- Preferências: {self.user_context['preferences']['temperature_unit']}, ")
         
-        # Adiciona histórico resumido se houver
-        history_section = ""
-        if self.conversation_history:
-            history_section = "Últimas interações:\n"
-            for i, (role, msg) in enumerate(self.conversation_history[-3:], 1):
-                history_section += f"{i}. {role}: {msg}\n"
-            history_section += "\n"
+        # Histórico já renderizado (o ChatHistory só remonta a seção quando muda)
+        history_section = self.conversation_history.render() if self.conversation_history else ""
         
         # Data atual para contexto temporal
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         time_section = f"Data e hora atual: {current_time}\n\n"
         
-        # Instruções finais
-        final_instructions = (
-            "Diretrizes importantes:\n"
-            "- Se o usuário perguntar sobre clima sem especificar localização, "
-            "use a localização padrão se disponível.\n"
-            "- Para previsões, sempre especifique a fonte dos dados.\n"
-            "- Mantenha respostas claras e informativas.\n"
-            "- Use emojis relevantes quando apropriado para melhorar a experiência."
-        )
-        
-        return (
-            base_instructions + 
-            context_section + 
-            history_section + 
-            time_section + 
-            final_instructions
-        )
+        return "".join((BASE_INSTRUCTIONS, *context_lines, history_section, time_section, FINAL_INSTRUCTIONS))
     
     async def chat(self, query: str) -> str:
         # Atualiza histórico antes de processar
@@ -125,16 +120,22 @@ class ChatSession:
                 return error_msg
     
     def _update_history(self, role: str, message: str):
-        """Atualiza o histórico de conversação"""
-        self.conversation_history.append((role, message.strip()))
-        
-        # Mantém um limite razoável no histórico
-        if len(self.conversation_history) > 10:
-            self.conversation_history.pop(0)
+        """Atualiza o histórico de conversação (descarta as mais antigas acima do orçamento de tokens)"""
+        self.conversation_history.append(role, message.strip())
     
     async def close(self):
         await self.mcp_server.__aexit__(None, None, None)
 
+async def criar_sessao() -> ChatSession:
+    session = ChatSession()
+    await session.initialize()
+    return session
+
+async def batch(path: str, concurrency: int):
+    # Modo batch: todas as perguntas do arquivo em paralelo sobre um pool de sessões
+    for query, response in await run_batch(read_queries(path), criar_sessao, concurrency):
+        print(f"\nVocê: {query}\nAssistente: {response}")
+
 async def main():
     session = ChatSession()
     try:
@@ -144,7 +145,8 @@ async def main():
         
         while True:
             try:
-                query = input("\nVocê: ").strip()
+                # Lê o stdin numa thread: o loop segue atendendo o servidor MCP enquanto o usuário digita
+                query = (await ainput("\nVocê: ")).strip()
                 if query.lower() in ('sair', 'exit', 'quit'):
                     break
                     
@@ -154,7 +156,7 @@ async def main():
                 response = await session.chat(query)
                 print("\nAssistente:", response)
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\nEncerrando a sessão...")
                 break
             except Exception as e:
@@ -169,4 +171,8 @@ async def main():
         print("Sessão encerrada. Até logo!")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Assistente climático")
+    parser.add_argument("--batch", metavar="FILE", help="arquivo com uma pergunta por linha")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessões em paralelo no modo batch")
+    args = parser.parse_args()
+    asyncio.run(batch(args.batch, args.concurrency) if args.batch else main())
\ No newline at end of file
@@ -8,6 +8,8 @@ import sys
 
 sys.path.append(os.path.abspath('/home/pi/mcp/src/server'))
 import webhookserver  # Importa o módulo do server, que possui a fila message_queue
+from console import ainput
+from agent_registry import ChatContext
 
 load_dotenv()
 
@@ -22,13 +24,19 @@ server_params = {
 
 
 
+def instructions(ctx, agent) -> str:
+    # Instruções dinâmicas: cada Runner.run leva o próprio recorte do histórico,
+    # então o agente compartilhado nunca é alterado
+    return "Você é um assistente chatbot útil. Últimas mensagens:\n" + "\n".join(
+        f"{role}: {msg}" for role, msg in ctx.context.history
+    )
+
 async def run():
     # Inicia o MCPServerStdio; isso vai rodar o seu server.py como um subprocesso
     async with MCPServerStdio(params=server_params) as mcp_server:
         agent = Agent(
             name="Assistant",
-            instructions="Você é um assistente chatbot útil. Últimas mensagens:\n" +
-                         "\n".join(f"{role}: {msg}" for role, msg in conversation_history[-3:]),
+            instructions=instructions,
             model="gpt-4o-mini",
             tools=[WebSearchTool()],
             mcp_servers=[mcp_server],
@@ -40,16 +48,20 @@ async def run():
         
         # Loop principal para receber input do usuário e tratar as interações com o agente
         while True:
-            query = input("\nVocê: ").strip()
+            # Lê o stdin numa thread para a tarefa da fila continuar rodando enquanto o usuário digita
+            try:
+                query = (await ainput("\nVocê: ")).strip()
+            except EOFError:
+                break
             if query.lower() in ('sair', 'exit'):
                 break
 
             conversation_history.append(("User", query))
             with trace("Agent interaction", trace_id=gen_trace_id()):
                 try:
-                    # Atualiza as instruções com o histórico recente
-                    agent.instructions = "Histórico:\n" + "\n".join(f"{role}: {msg}" for role, msg in conversation_history[-3:])
-                    result = await Runner.run(agent, query)
+                    # Histórico recente vai no contexto da execução
+                    context = ChatContext("local", conversation_history[-3:])
+                    result = await Runner.run(agent, query, context=context)
                     response = result.final_output
                     conversation_history.append(("Assistant", response))
                     print("\nAssistente:", response)
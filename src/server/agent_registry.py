@@ -0,0 +1,43 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from agents import Agent
+
+
+@dataclass
+class ChatContext:
+    """Contexto de uma requisição, passado em Runner.run(..., context=...).
+
+    As instruções dinâmicas do template leem daqui o histórico do chat, então
+    o mesmo Agent atende chats diferentes ao mesmo tempo sem ser alterado.
+    """
+    chat_id: str
+    history: list = field(default_factory=list)  # [(role, mensagem)]
+
+
+class AgentRegistry:
+    """Um Agent por servidor MCP, derivado de um template criado no startup.
+
+    O template não é alterado depois de criado; cada servidor do pool ganha
+    um clone com `mcp_servers=[server]` na primeira vez que aparece. Guarda no
+    máximo `maxsize` clones (LRU), então os de servidores já respawnados pelo
+    pool saem sozinhos.
+    """
+
+    def __init__(self, template: Agent, maxsize: int = 8):
+        self.template = template
+        self.maxsize = maxsize
+        self._agents = OrderedDict()  # servidor MCP -> Agent
+
+    def for_server(self, mcp_server) -> Agent:
+        agent = self._agents.get(mcp_server)
+        if agent is None:
+            agent = self._agents[mcp_server] = self.template.clone(mcp_servers=[mcp_server])
+            while len(self._agents) > self.maxsize:
+                self._agents.popitem(last=False)
+        else:
+            self._agents.move_to_end(mcp_server)
+        return agent
+
+    def __len__(self):
+        return len(self._agents)
@@ -0,0 +1,66 @@
+from collections import deque
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token em pt/en)"""
+    return len(text) // 4 + 1
+
+
+class ChatHistory:
+    """Histórico de uma conversa limitado por orçamento de tokens.
+
+    Guarda as mensagens mais recentes enquanto a soma estimada de tokens
+    couber em `max_tokens` (a última sempre fica). Adicionar e descartar
+    são O(1), e a seção renderizada para o prompt é mantida junto: cada
+    mensagem nova só acrescenta a sua linha e as descartadas são cortadas do
+    início, sem remontar a janela inteira a cada turno.
+    """
+
+    def __init__(self, max_tokens: int = 1000, header: str = "Últimas interações:\n"):
+        self.max_tokens = max_tokens
+        self.header = header
+        self._items = deque()  # (role, message, linha renderizada, tokens)
+        self._tokens = 0
+        self._body = ""  # linhas renderizadas da janela atual
+        self._section = ""
+
+    def append(self, role: str, message: str):
+        line = f"{role}: {message}\n"
+        tokens = estimate_tokens(line)
+        self._items.append((role, message, line, tokens))
+        self._tokens += tokens
+        body = self._body + line
+        dropped = 0
+        while self._tokens > self.max_tokens and len(self._items) > 1:
+            _, _, old_line, old_tokens = self._items.popleft()
+            self._tokens -= old_tokens
+            dropped += len(old_line)
+        # Corta do início só o tamanho das linhas descartadas
+        self._body = body[dropped:] if dropped else body
+        self._section = self.header + self._body + "\n"
+
+    def render(self) -> str:
+        """Seção de histórico para as instruções ("" se vazio)"""
+        return self._section
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens
+
+    def clear(self):
+        self._items.clear()
+        self._tokens = 0
+        self._body = ""
+        self._section = ""
+
+    def __iter__(self):
+        return ((role, message) for role, message, _, _ in self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        role, message, _, _ = self._items[index]
+        return role, message
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+from metrics import LatencyWindow
+
+
+def _deliver(future, result=None, error=None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+async def ainput(prompt: str = "") -> str:
+    """input() sem travar o event loop.
+
+    A leitura roda numa thread daemon (não segura a saída do processo se o
+    usuário não apertar Enter); EOF (Ctrl+D) chega como EOFError.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(_deliver, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_deliver, future, line)
+
+    threading.Thread(target=read, name="stdin", daemon=True).start()
+    return await future
+
+
+def read_queries(path: str) -> list:
+    """Perguntas do modo batch: uma por linha, ignorando vazias e comentários (#)"""
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+async def run_batch(queries, create_session, concurrency: int = 4):
+    """Roda as perguntas em paralelo sobre um pool de `concurrency` sessões.
+
+    `create_session` é uma função async que devolve uma sessão já
+    inicializada (com chat() e close()). Retorna [(pergunta, resposta)] na
+    ordem de entrada e imprime vazão e latências no final.
+    """
+    if not queries:
+        print("Nenhuma pergunta no arquivo.")
+        return []
+    concurrency = max(1, min(concurrency, len(queries)))
+    latency = LatencyWindow(len(queries))
+    failures = 0
+    pool = asyncio.Queue()
+
+    async def ask(query):
+        nonlocal failures
+        session = await pool.get()
+        started = time.perf_counter()
+        try:
+            return query, await session.chat(query)
+        except Exception as e:
+            failures += 1
+            return query, f"Erro: {e}"
+        finally:
+            latency.add(time.perf_counter() - started)
+            pool.put_nowait(session)
+
+    # Sessões abertas e fechadas nesta mesma task: o MCPServerStdio (anyio)
+    # não pode sair numa task diferente da que entrou
+    sessions = []
+    try:
+        for _ in range(concurrency):
+            sessions.append(await create_session())
+            pool.put_nowait(sessions[-1])
+        started = time.perf_counter()
+        results = await asyncio.gather(*(ask(query) for query in queries))
+        elapsed = time.perf_counter() - started
+    finally:
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                print("Erro ao fechar sessão:", e)
+
+    summary = latency.summary()
+    print(
+        f"\n{len(queries)} perguntas em {elapsed:.1f}s com {concurrency} sessões "
+        f"({len(queries) / elapsed:.2f} perguntas/s, {failures} erros) - "
+        f"latência p50 {summary['p50']:.0f} ms, p95 {summary['p95']:.0f} ms, máx {summary['max']:.0f} ms"
+    )
+    return results
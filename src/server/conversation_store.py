@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Custo aproximado de cada mensagem além do texto (tupla + posição no deque)
+MESSAGE_OVERHEAD = 64
+
+
+def _message_size(content: str) -> int:
+    return sys.getsizeof(content) + MESSAGE_OVERHEAD
+
+
+class _Chat:
+    __slots__ = ("messages", "last_seen", "size")
+
+    def __init__(self, max_messages: int, last_seen: float):
+        self.messages = deque(maxlen=max_messages)
+        self.last_seen = last_seen
+        self.size = 0
+
+
+class ConversationStore:
+    """Histórico recente por chat, em memória.
+
+    Cada chat guarda no máximo `max_messages` mensagens (ring buffer). Os chats
+    ficam em ordem de atividade (LRU) e são descartados quando:
+      - ficam parados por mais de `ttl` segundos;
+      - o total de mensagens passa de `max_total`;
+      - o tamanho estimado em memória passa de `max_bytes`.
+
+    Com `path`, o conteúdo é gravado em JSON (troca atômica do arquivo) no
+    máximo a cada `snapshot_interval` segundos e no close(), e recarregado na
+    criação. Os ids de chat precisam ser strings.
+    """
+
+    def __init__(self, max_messages: int = 10, max_total: int = None, ttl: float = None,
+                 max_bytes: int = None, path: str = None, snapshot_interval: float = 60):
+        self.max_messages = max_messages
+        self.max_total = max_total
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self._chats = OrderedDict()  # chat_id -> _Chat, do menos para o mais ativo
+        self._total = 0
+        self._bytes = 0
+        self._saved_at = time.monotonic()
+        self.evicted_chats = 0
+        self.expired_chats = 0
+        if path:
+            self._load()
+
+    def append(self, chat_id, role: str, content: str, at: float = None):
+        """Adiciona uma mensagem ao chat; `at` (epoch) permite aquecer com o horário original"""
+        now = time.time()
+        self.expire(now)
+        if at is None:
+            at = now
+        elif self.ttl is not None and at <= now - self.ttl:
+            return
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(self.max_messages, at)
+        else:
+            self._chats.move_to_end(chat_id)
+            chat.last_seen = max(chat.last_seen, at)
+        self._push(chat, role, content)
+        self._evict()
+        if self.path and time.monotonic() - self._saved_at >= self.snapshot_interval:
+            self.save()
+
+    def _push(self, chat: _Chat, role: str, content: str):
+        if len(chat.messages) == self.max_messages:
+            # O deque descarta a mais antiga ao receber a nova
+            removed = _message_size(chat.messages[0][1])
+            chat.size -= removed
+            self._bytes -= removed
+        else:
+            self._total += 1
+        size = _message_size(content)
+        chat.size += size
+        self._bytes += size
+        chat.messages.append((role, content))
+
+    def history(self, chat_id, n: int = None) -> list:
+        """Mensagens do chat como (role, content), da mais antiga para a mais nova"""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            return []
+        if self.ttl is not None and chat.last_seen <= time.time() - self.ttl:
+            self._drop(chat_id)
+            self.expired_chats += 1
+            return []
+        items = list(chat.messages)
+        return items if n is None else items[-n:]
+
+    def expire(self, now: float = None) -> int:
+        """Descarta os chats parados há mais de `ttl` segundos; retorna quantos"""
+        if self.ttl is None:
+            return 0
+        limit = (time.time() if now is None else now) - self.ttl
+        expired = 0
+        # Os mais antigos ficam no começo, então basta olhar a frente da fila
+        while self._chats:
+            chat_id, chat = next(iter(self._chats.items()))
+            if chat.last_seen > limit:
+                break
+            self._drop(chat_id)
+            expired += 1
+        self.expired_chats += expired
+        return expired
+
+    def _over_limit(self) -> bool:
+        if self.max_total is not None and self._total > self.max_total:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _evict(self):
+        while self._over_limit() and len(self._chats) > 1:
+            self._drop(next(iter(self._chats)))
+            self.evicted_chats += 1
+
+    def _drop(self, chat_id):
+        chat = self._chats.pop(chat_id)
+        self._total -= len(chat.messages)
+        self._bytes -= chat.size
+
+    def __contains__(self, chat_id):
+        return chat_id in self._chats
+
+    def __len__(self):
+        return len(self._chats)
+
+    def stats(self) -> dict:
+        return {
+            "chats": len(self._chats),
+            "messages": self._total,
+            "bytes": self._bytes,
+            "max_messages": self.max_messages,
+            "max_total": self.max_total,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evicted_chats": self.evicted_chats,
+            "expired_chats": self.expired_chats,
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        self._saved_at = time.monotonic()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(
+                    [[chat_id, chat.last_seen, list(chat.messages)] for chat_id, chat in self._chats.items()],
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar histórico em disco ({self.path}): {e}")
+
+    async def close(self):
+        """Grava o snapshot final (para registrar no on_shutdown do loop)"""
+        self.save()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                items = json.load(f)
+        except Exception as e:
+            logger.warning(f"Histórico em disco ignorado ({self.path}): {e}")
+            return
+        limit = None if self.ttl is None else time.time() - self.ttl
+        for chat_id, last_seen, messages in items:
+            if limit is not None and last_seen <= limit:
+                continue
+            chat = self._chats[chat_id] = _Chat(self.max_messages, last_seen)
+            for role, content in messages[-self.max_messages:]:
+                self._push(chat, role, content)
+        self._evict()
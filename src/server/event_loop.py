@@ -0,0 +1,84 @@
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+
+# Teto por hook no stop(): acima dos prazos dos próprios hooks (ex.: JobQueue.close
+# drena por até 30 s), para um hook só começar depois do anterior terminar
+HOOK_TIMEOUT = 60
+
+
+class BackgroundLoop:
+    """Event loop persistente rodando numa thread própria.
+
+    Handlers síncronos (Flask) submetem corrotinas para cá em vez de chamar
+    asyncio.run a cada requisição, então pools, sessões MCP e caches criados
+    no loop são compartilhados entre todas as requisições.
+    """
+
+    def __init__(self, name: str = "asyncio-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, coro):
+        """Agenda a corrotina no loop e devolve um concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Executa a corrotina no loop e bloqueia a thread chamadora até o resultado"""
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def on_shutdown(self, hook):
+        """Registra uma função async (ex.: pool.close) a ser aguardada no stop()"""
+        self._shutdown_hooks.append(hook)
+        return hook
+
+    def stop(self, timeout: float = 10, hook_timeout: float = HOOK_TIMEOUT):
+        if self._thread is None:
+            return
+        # Na ordem de registro: quem drena trabalho (fila) registra antes dos clientes
+        for hook in self._shutdown_hooks:
+            future = self.submit(hook())
+            try:
+                future.result(hook_timeout)
+            except concurrent.futures.TimeoutError:
+                # Não deixa o hook rodando por baixo do próximo
+                future.cancel()
+            except Exception:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+_default = None
+
+
+def get_loop() -> BackgroundLoop:
+    """Loop compartilhado do processo (criado no primeiro uso)"""
+    global _default
+    if _default is None:
+        _default = BackgroundLoop()
+        atexit.register(_default.stop)
+    return _default
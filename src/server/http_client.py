@@ -0,0 +1,63 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+
+try:
+    import h2  # noqa: F401  (HTTP/2 do httpx é opcional: pip install httpx[http2])
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+_client = None
+_shutdown_hooks = []
+
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """Cliente compartilhado por todas as ferramentas do servidor MCP.
+
+    Normalmente criado pelo lifespan; fora dele (scripts, testes manuais) é
+    criado no primeiro uso.
+    """
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+def on_shutdown(callback):
+    """Registra uma função (sem argumentos) para rodar no fim do lifespan"""
+    _shutdown_hooks.append(callback)
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """Lifespan do FastMCP: abre o cliente no startup; no shutdown roda os
+    ganchos registrados (ex.: snapshot final do cache) e fecha o cliente"""
+    global _client
+    _client = create_client()
+    logger.info(f"Cliente HTTP compartilhado criado (http2={HTTP2})")
+    try:
+        yield {}
+    finally:
+        for callback in _shutdown_hooks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Erro no shutdown ({callback}): {e}")
+        await _client.aclose()
+        _client = None
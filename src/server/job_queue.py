@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import deque
+
+from metrics import LatencyWindow
+from rate_limit import current_reservation
+
+
+class JobQueue:
+    """Fila de mensagens por chat processadas por um pool de workers asyncio.
+
+    O webhook só enfileira e responde; os workers chamam o handler em
+    background. Cada chat tem a sua própria fila e fica com no máximo um
+    worker por vez, então as mensagens de um chat saem estritamente na ordem
+    de chegada enquanto chats diferentes rodam em paralelo (até `workers`
+    ao mesmo tempo). Chats com mensagens pendentes se revezam entre os
+    workers (round-robin), sem um chat ocupado segurar os outros.
+
+    submit() recusa o job quando o chat já tem `per_chat` mensagens na fila
+    ou o total passa de `maxsize`; o webhook devolve 503 e o WAHA tenta de
+    novo mais tarde.
+
+    Com `limiter` (RateLimiter), o chat acima do limite não ocupa worker: volta
+    para a fila de prontos depois do tempo de espera e as mensagens que
+    chegam nesse meio tempo se acumulam. Quando chega a vez, `merge` (se
+    informado) junta as pendentes num job só. `text(job)` é o texto usado
+    para estimar o custo; a reserva feita fica em `current_reservation`
+    enquanto o handler roda, para ele informar o uso real em settle().
+
+    Com `debounce` (segundos) e `merge`, o chat só é processado depois de
+    ficar `debounce` sem mensagem nova, e tudo o que chegou vira um turno
+    só. Mensagem nova com o handler do chat rodando cancela a geração em
+    andamento (a resposta ficou velha) e a mensagem cancelada volta para a
+    fila junto com as novas, a menos que o handler já tenha chamado
+    commit() (resposta começando a ser enviada).
+    """
+
+    def __init__(self, handler, background, workers: int = 4, maxsize: int = 100, per_chat: int = 10,
+                 limiter=None, text=None, merge=None, debounce: float = 0.0):
+        self.handler = handler
+        self.background = background
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.per_chat = max(1, per_chat)
+        self.limiter = limiter
+        self.text = text
+        self.merge = merge
+        self.debounce = debounce if merge is not None else 0.0
+        self._deferred = set()  # chats adiados pelo limiter
+        self._running = {}  # chat_id -> task do handler ainda cancelável
+        self._ready = None  # chats com mensagens esperando e sem worker
+        self._tasks = []
+        self._chats = {}  # chat_id -> deque[(job, enfileirado_em)]
+        self._pending = 0
+        self._active = 0
+        self._idle = None
+        # Métricas
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.rejected_chat = 0
+        self.deferred = 0
+        self.coalesced = 0
+        self.superseded = 0
+        self.max_depth = 0
+        self.max_active = 0
+        self.queue_wait = LatencyWindow()
+        self.processing = LatencyWindow()
+
+    def _start(self):
+        # Executado dentro do loop
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _offer(self, chat_id, job) -> bool:
+        self._start()
+        jobs = self._chats.get(chat_id)
+        if jobs is not None and len(jobs) >= self.per_chat:
+            self.rejected_chat += 1
+            return False
+        if self._pending >= self.maxsize:
+            self.rejected += 1
+            return False
+        if jobs is None:
+            # Chat sem nada pendente nem em andamento: entra na fila de prontos
+            jobs = self._chats[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        jobs.append((job, time.monotonic()))
+        if self.debounce and chat_id in self._running:
+            # A resposta em andamento não considera esta mensagem: descarta a geração
+            self._running.pop(chat_id).cancel()
+        self._pending += 1
+        self._idle.clear()
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._pending)
+        return True
+
+    def submit(self, chat_id, job) -> bool:
+        """Enfileira o job a partir de uma thread qualquer (ex.: handler do Flask)"""
+        return self.background.run(self._offer(chat_id, job), timeout=5)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            jobs = self._chats[chat_id]
+            admitted, reservation = self._admit(chat_id, jobs)
+            if not admitted:
+                continue
+            job, enqueued_at = jobs[0]
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+            started = time.monotonic()
+            self.queue_wait.add(started - enqueued_at)
+            # A task copia o contexto atual, então cada handler vê a sua reserva
+            current_reservation.set(reservation)
+            task = asyncio.create_task(self.handler(job))
+            self._running[chat_id] = task
+            try:
+                await asyncio.wait([task])
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                if self._running.get(chat_id) is task:
+                    del self._running[chat_id]
+                self.processing.add(time.monotonic() - started)
+                self._active -= 1
+            if task.cancelled():
+                # Ficou velha: o job continua no deque e sai junto com os novos;
+                # a reserva volta, senão o próprio turno cancelado adia o próximo
+                self.superseded += 1
+                if self.limiter is not None:
+                    self.limiter.refund(reservation)
+            else:
+                if task.exception() is None:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+                    print("Erro ao processar mensagem:", task.exception())
+                # Só sai da fila depois de processado: enquanto o deque não
+                # está vazio o chat continua "ocupado" e o _offer não o agenda
+                jobs.popleft()
+                self._pending -= 1
+            if jobs:
+                self._ready.put_nowait(chat_id)
+            else:
+                del self._chats[chat_id]
+                if self._pending == 0:
+                    self._idle.set()
+
+    def commit(self, chat_id):
+        """Chamado pelo handler antes de enviar a resposta: daqui em diante
+        mensagens novas não cancelam mais a geração do chat"""
+        self._running.pop(chat_id, None)
+
+    def _retry_later(self, chat_id, wait):
+        asyncio.get_running_loop().call_later(wait, self._ready.put_nowait, chat_id)
+
+    def _admit(self, chat_id, jobs) -> tuple:
+        """(pode processar agora, reserva no limiter)"""
+        if self.debounce:
+            # Espera o chat ficar `debounce` sem mensagem nova
+            quiet = jobs[-1][1] + self.debounce - time.monotonic()
+            if quiet > 0:
+                self._retry_later(chat_id, quiet)
+                return False, None
+        if (self.debounce or chat_id in self._deferred) and self.merge is not None and len(jobs) > 1:
+            # Mensagens em sequência (ou adiadas pelo limite) viram uma chamada só
+            merged = self.merge([job for job, _ in jobs])
+            first_at = jobs[0][1]
+            self.coalesced += len(jobs) - 1
+            self._pending -= len(jobs) - 1
+            jobs.clear()
+            jobs.append((merged, first_at))
+        if self.limiter is None:
+            return True, None
+        text = self.text(jobs[0][0])
+        wait = self.limiter.delay(chat_id, text)
+        if wait > 0:
+            # Conta uma vez por turno adiado, não a cada nova conferência
+            if chat_id not in self._deferred:
+                self._deferred.add(chat_id)
+                self.deferred += 1
+            self._retry_later(chat_id, wait)
+            return False, None
+        self._deferred.discard(chat_id)
+        return True, self.limiter.take(chat_id, text)
+
+    async def close(self, timeout: float = 30):
+        """Espera as filas esvaziarem (até timeout) e encerra os workers"""
+        if self._ready is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._ready = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "per_chat": self.per_chat,
+            "depth": self._pending,
+            "chats": len(self._chats),
+            "active": self._active,
+            "max_active": self.max_active,
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "rejected_chat": self.rejected_chat,
+            "deferred": self.deferred,
+            "coalesced": self.coalesced,
+            "superseded": self.superseded,
+            "debounce_ms": round(self.debounce * 1000),
+            "queue_wait_ms": self.queue_wait.summary(),
+            "processing_ms": self.processing.summary(),
+        }
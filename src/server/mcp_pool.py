@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from agents.mcp import MCPServerStdio
+
+from metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Tamanho padrão do pool e intervalo do health check (segundos)
+DEFAULT_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+DEFAULT_HEALTH_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_INTERVAL", "30"))
+
+
+class _Slot:
+    """Uma posição do pool: o servidor MCP atual e o sinal para recriá-lo"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.server = None
+        self.dead = asyncio.Event()
+
+
+class MCPServerPool:
+    """Pool de sessões MCPServerStdio mantidas quentes entre mensagens.
+
+    Cada slot é dono do seu subprocesso: uma task dedicada entra e sai do
+    context manager do MCPServerStdio (o anyio exige que seja na mesma task)
+    e recria o servidor sempre que o slot é marcado como morto.
+    Deve ser usado sempre a partir do mesmo event loop.
+    """
+
+    def __init__(self, params: dict, size: int = DEFAULT_POOL_SIZE,
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL,
+                 ping_timeout: float = 5.0):
+        self.params = params
+        self.size = max(1, size)
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self._idle = None
+        self._slots = []
+        self._tasks = []
+        self._start_lock = None
+        self._started = False
+        self._closing = False
+        # Métricas
+        self.checkout_wait = LatencyWindow()
+        self.respawns = 0
+        self.spawn_failures = 0
+        self.health_failures = 0
+
+    async def start(self):
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            self._idle = asyncio.Queue()
+            self._slots = [_Slot(i) for i in range(self.size)]
+            self._tasks = [asyncio.create_task(self._run_slot(slot)) for slot in self._slots]
+            if self.health_interval > 0:
+                self._tasks.append(asyncio.create_task(self._health_loop()))
+            self._started = True
+
+    async def close(self):
+        self._closing = True
+        for slot in self._slots:
+            slot.dead.set()
+        if self._tasks:
+            # Dá tempo para cada slot encerrar o subprocesso na própria task
+            _, pending = await asyncio.wait(self._tasks, timeout=5)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        self._started = False
+
+    async def _run_slot(self, slot: _Slot):
+        backoff = 1.0
+        while not self._closing:
+            try:
+                async with MCPServerStdio(params=self.params, cache_tools_list=True) as server:
+                    slot.server = server
+                    slot.dead.clear()
+                    backoff = 1.0
+                    self._idle.put_nowait(slot)
+                    await slot.dead.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.spawn_failures += 1
+                logger.error(f"Falha no servidor MCP do slot {slot.index}: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                slot.server = None
+            if not self._closing:
+                self.respawns += 1
+                logger.info(f"Recriando servidor MCP do slot {slot.index}")
+
+    async def _ping(self, server) -> bool:
+        session = getattr(server, "session", None)
+        if session is None:
+            return False
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    def _retire(self, slot: _Slot):
+        self.health_failures += 1
+        logger.warning(f"Servidor MCP do slot {slot.index} não responde, será recriado")
+        slot.dead.set()
+
+    async def _health_loop(self):
+        while not self._closing:
+            await asyncio.sleep(self.health_interval)
+            # Só verifica os slots ociosos, para não competir com quem está usando
+            for _ in range(self._idle.qsize()):
+                try:
+                    slot = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if self._closing or slot.dead.is_set() or slot.server is None:
+                    # Slot já retirado: a task dona recoloca o servidor novo na fila
+                    continue
+                if await self._ping(slot.server):
+                    self._idle.put_nowait(slot)
+                else:
+                    self._retire(slot)
+
+    @asynccontextmanager
+    async def acquire(self, timeout: float = None):
+        """Empresta um servidor MCP do pool e o devolve ao final"""
+        await self.start()
+        started = time.monotonic()
+        while True:
+            slot = await asyncio.wait_for(self._idle.get(), timeout)
+            # Um slot pode ter sido marcado como morto enquanto estava na fila
+            if not slot.dead.is_set() and slot.server is not None:
+                break
+        self.checkout_wait.add(time.monotonic() - started)
+
+        healthy = True
+        try:
+            yield slot.server
+        except Exception:
+            healthy = await self._ping(slot.server)
+            raise
+        finally:
+            if healthy:
+                self._idle.put_nowait(slot)
+            else:
+                self._retire(slot)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "respawns": self.respawns,
+            "spawn_failures": self.spawn_failures,
+            "health_failures": self.health_failures,
+            "checkout_wait_ms": self.checkout_wait.summary(),
+        }
@@ -0,0 +1,92 @@
+import asyncio
+import re
+import time
+
+# Fim de frase (seguido de espaço) ou quebra de linha
+BOUNDARY = re.compile(r"[.!?…](?=\s)|\n")
+
+
+class SentenceChunker:
+    """Junta os deltas de texto do modelo e libera só frases/parágrafos completos.
+
+    take() devolve todo o texto completo acumulado desde a última entrega,
+    desde que tenha pelo menos `min_chars` (pedaços pequenos esperam o
+    próximo). Sem fronteira nenhuma, o texto é cortado no último espaço ao
+    passar de `max_chars`.
+    """
+
+    def __init__(self, min_chars: int = 80, max_chars: int = 1500):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, delta: str):
+        self._buffer += delta
+
+    def _cut(self) -> int:
+        end = 0
+        for match in BOUNDARY.finditer(self._buffer):
+            end = match.end()
+        if not end and len(self._buffer) >= self.max_chars:
+            end = self._buffer.rfind(" ", 0, self.max_chars) + 1 or self.max_chars
+        return end
+
+    def ready(self) -> bool:
+        return len(self._buffer.strip()) >= self.min_chars and self._cut() >= self.min_chars
+
+    def take(self, final: bool = False):
+        """Próximo pedaço a enviar, ou None; com final=True entrega o que sobrou"""
+        end = len(self._buffer) if final else self._cut()
+        if not final and end < self.min_chars:
+            return None
+        chunk, self._buffer = self._buffer[:end].strip(), self._buffer[end:].lstrip()
+        return chunk or None
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._buffer.strip())
+
+
+async def paced_chunks(deltas, min_chars: int = 80, interval: float = 1.0, max_chars: int = 1500):
+    """Converte um stream de deltas em pedaços prontos para enviar, no máximo
+    um a cada `interval` segundos.
+
+    Enquanto espera o intervalo o texto continua chegando, e o próximo pedaço
+    leva tudo o que ficou completo nesse meio tempo. Erros do stream são
+    repassados depois de entregar o que já tinha chegado.
+    """
+    chunker = SentenceChunker(min_chars, max_chars)
+    ready = asyncio.Event()
+    done = False
+
+    async def produce():
+        nonlocal done
+        try:
+            async for delta in deltas:
+                chunker.feed(delta)
+                if chunker.ready():
+                    ready.set()
+        finally:
+            done = True
+            ready.set()
+
+    task = asyncio.create_task(produce())
+    last_sent = None
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            if last_sent is not None:
+                wait = interval - (time.monotonic() - last_sent)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            finished = done
+            chunk = chunker.take(final=finished)
+            if chunk:
+                yield chunk
+                last_sent = time.monotonic()
+            if finished and not chunker.pending:
+                break
+        await task
+    finally:
+        task.cancel()
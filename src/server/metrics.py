@@ -0,0 +1,68 @@
+from collections import deque
+
+
+class LatencyWindow:
+    """Janela com as últimas N medições (em segundos) para calcular percentis"""
+
+    def __init__(self, size: int = 1000):
+        self._values = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self._values.append(seconds)
+        self.count += 1
+
+    def summary(self) -> dict:
+        """Percentis em milissegundos"""
+        values = sorted(self._values)
+        if not values:
+            return {"count": self.count, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        def percentile(p):
+            return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+        return {
+            "count": self.count,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "max": round(values[-1] * 1000, 2),
+        }
+
+
+class TokenUsage:
+    """Tokens de entrada (em cache e sem cache) e de saída, por turno e acumulados.
+
+    Aceita o `usage` do Agents SDK ou da Responses API (mesmos campos).
+    """
+
+    def __init__(self):
+        self.turns = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, usage) -> dict:
+        """Soma o uso de um turno e devolve o detalhe desse turno"""
+        details = getattr(usage, "input_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        turn = {
+            "input": usage.input_tokens,
+            "cached": cached,
+            "uncached": usage.input_tokens - cached,
+            "output": usage.output_tokens,
+        }
+        self.turns += 1
+        self.input_tokens += turn["input"]
+        self.cached_tokens += cached
+        self.output_tokens += turn["output"]
+        return turn
+
+    def summary(self) -> dict:
+        return {
+            "turns": self.turns,
+            "input": self.input_tokens,
+            "cached": self.cached_tokens,
+            "uncached": self.input_tokens - self.cached_tokens,
+            "output": self.output_tokens,
+            "cache_rate": round(self.cached_tokens / self.input_tokens, 3) if self.input_tokens else 0.0,
+        }
@@ -0,0 +1,171 @@
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from chat_history import estimate_tokens
+
+# Reserva da chamada em andamento; a JobQueue define antes de rodar o handler
+# (cada task tem a sua cópia), e quem lê o uso real passa para settle()
+current_reservation = ContextVar("current_reservation", default=None)
+
+
+class TokenBucket:
+    """Balde de fichas: enche `rate` por segundo até `capacity`.
+
+    take() sempre consome (o nível pode ficar negativo, como uma reserva) e
+    wait() diz quanto falta para caber um pedido; assim nada é recusado, só
+    adiado.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float, now: float) -> float:
+        """Segundos até caber `amount` (pedidos maiores que o balde esperam ele encher)"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def refund(self, amount: float):
+        # amount negativo cobra a diferença (uso real maior que o estimado)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Reservation:
+    """O que take() reservou para uma chamada, até ela ser acertada em settle()"""
+
+    __slots__ = ("contact", "text_tokens", "tokens", "settled", "refunded")
+
+    def __init__(self, contact: str, text_tokens: int, tokens: int):
+        self.contact = contact
+        self.text_tokens = text_tokens
+        self.tokens = tokens
+        self.settled = False
+        self.refunded = False
+
+
+class RateLimiter:
+    """Limites das chamadas ao modelo: por contato e globais (RPM e TPM).
+
+    Cada contato tem um balde de `contact_rpm` chamadas por minuto com rajada
+    de `contact_burst`; todos dividem `rpm` chamadas e `tpm` tokens por
+    minuto. O custo de uma chamada é estimado pelo tamanho da mensagem mais
+    um overhead (instruções, histórico e resposta) que é ajustado com o uso
+    real informado em settle(). Limite 0 desliga o respectivo balde.
+
+    delay() só consulta; take() reserva e devolve a reserva da chamada, que
+    volta em settle() com o uso real (sempre, também quando a chamada falha
+    ou é cancelada). Quem chama adia a mensagem pelo tempo
+    devolvido em vez de descartá-la. Guarda no máximo `max_contacts` baldes
+    de contato (LRU).
+    """
+
+    def __init__(self, contact_rpm: float = 6, contact_burst: int = 3, rpm: float = 300,
+                 tpm: float = 150000, overhead: int = 1500, max_contacts: int = 10000):
+        self.contact_rpm = contact_rpm
+        self.contact_burst = contact_burst
+        self.max_contacts = max_contacts
+        self.overhead = float(overhead)
+        self._rpm = TokenBucket(rpm / 60, rpm) if rpm else None
+        self._tpm = TokenBucket(tpm / 60, tpm) if tpm else None
+        self._contacts = OrderedDict()  # contato -> TokenBucket
+        # Métricas
+        self.calls = 0
+        self.estimated_tokens = 0
+        self.used_tokens = 0
+        self.refunded = 0
+
+    def estimate(self, text: str) -> int:
+        return estimate_tokens(text) + int(self.overhead)
+
+    def delay(self, contact: str, text: str) -> float:
+        """Segundos que a mensagem deve esperar (0 = pode chamar o modelo agora)"""
+        now = time.monotonic()
+        waits = [0.0]
+        bucket = self._contacts.get(contact)
+        if bucket is not None:
+            waits.append(bucket.wait(1, now))
+        if self._rpm is not None:
+            waits.append(self._rpm.wait(1, now))
+        if self._tpm is not None:
+            waits.append(self._tpm.wait(self.estimate(text), now))
+        return max(waits)
+
+    def take(self, contact: str, text: str) -> Reservation:
+        """Reserva uma chamada do contato"""
+        now = time.monotonic()
+        tokens = self.estimate(text)
+        if self.contact_rpm:
+            bucket = self._contacts.get(contact)
+            if bucket is None:
+                bucket = self._contacts[contact] = TokenBucket(self.contact_rpm / 60, self.contact_burst)
+                while len(self._contacts) > self.max_contacts:
+                    self._contacts.popitem(last=False)
+            else:
+                self._contacts.move_to_end(contact)
+            bucket.take(1, now)
+        if self._rpm is not None:
+            self._rpm.take(1, now)
+        if self._tpm is not None:
+            self._tpm.take(tokens, now)
+        self.calls += 1
+        self.estimated_tokens += tokens
+        return Reservation(contact, estimate_tokens(text), tokens)
+
+    def settle(self, reservation: Reservation, used_tokens: int = None):
+        """Uso real da chamada reservada: corrige o TPM e o overhead estimado.
+
+        used_tokens None = a chamada falhou ou foi cancelada sem uso conhecido:
+        os tokens reservados voltam ao TPM e o overhead não muda.
+        """
+        if reservation is None or reservation.settled:
+            return
+        reservation.settled = True
+        used = used_tokens or 0
+        self.used_tokens += used
+        if self._tpm is not None:
+            self._tpm.refund(reservation.tokens - used)
+        if used_tokens is not None:
+            # Média móvel do que vai além da mensagem em si
+            self.overhead = 0.8 * self.overhead + 0.2 * max(0, used_tokens - reservation.text_tokens)
+
+    def refund(self, reservation: Reservation):
+        """Chamada descartada sem servir (ex.: resposta substituída por mensagem
+        nova): devolve a ficha do contato, a do RPM e os tokens reservados"""
+        if reservation is None or reservation.refunded:
+            return
+        reservation.refunded = True
+        bucket = self._contacts.get(reservation.contact)
+        if bucket is not None:
+            bucket.refund(1)
+        if self._rpm is not None:
+            self._rpm.refund(1)
+        self.settle(reservation)
+        self.refunded += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        for bucket in (self._rpm, self._tpm):
+            if bucket is not None:
+                bucket._refill(now)
+        return {
+            "calls": self.calls,
+            "refunded": self.refunded,
+            "contacts": len(self._contacts),
+            "estimated_tokens": self.estimated_tokens,
+            "used_tokens": self.used_tokens,
+            "overhead": round(self.overhead),
+            "rpm_available": round(self._rpm.level, 1) if self._rpm else None,
+            "tpm_available": round(self._tpm.level) if self._tpm else None,
+        }
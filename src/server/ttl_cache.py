@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Cache em memória com expiração por item e despejo LRU.
+
+    Com `path`, o conteúdo é gravado em JSON (troca atômica do arquivo) no
+    máximo a cada `snapshot_interval` segundos e no save() final, e recarregado
+    na criação, então um servidor reiniciado já começa com o cache quente.
+    Chaves precisam ser strings e valores serializáveis.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600, path: str = None, snapshot_interval: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self._data = OrderedDict()  # chave -> (expira_em, valor)
+        self._saved_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if path:
+            self._load()
+
+    def get(self, key: str, default=None):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.time():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        if self.path and time.monotonic() - self._saved_at >= self.snapshot_interval:
+            self.save()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                items = json.load(f)
+        except Exception as e:
+            logger.warning(f"Cache em disco ignorado ({self.path}): {e}")
+            return
+        now = time.time()
+        for key, expires_at, value in items:
+            if expires_at > now:
+                self._data[key] = (expires_at, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        self._saved_at = time.monotonic()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump([[key, expires_at, value] for key, (expires_at, value) in self._data.items()], f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache em disco ({self.path}): {e}")
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+WAHA_URL = os.getenv("WAHA_URL", "http://localhost:3000")
+WAHA_SESSION = os.getenv("WAHA_SESSION", "default")
+
+# Falhas de conexão e 502/503/504 são repetidas com backoff. Erros de leitura
+# não, porque o WAHA pode já ter enviado a mensagem.
+RETRY_STATUS = (502, 503, 504)
+
+# O WhatsApp expira o "digitando..." depois de ~25s
+TYPING_REFRESH = 20
+
+
+def _parse(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {"status": response.status_code, "text": response.text}
+
+
+class WahaClient:
+    """Cliente síncrono do WAHA com conexões keep-alive reaproveitadas"""
+
+    def __init__(self, base_url: str = WAHA_URL, session: str = WAHA_SESSION,
+                 timeout: float = 10.0, connect_timeout: float = 3.0,
+                 retries: int = 3, backoff: float = 0.5, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+        self.timeout = (connect_timeout, timeout)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=None,
+            backoff_factor=backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self._http = requests.Session()
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
+    def post(self, path: str, payload: dict) -> dict:
+        response = self._http.post(f"{self.base_url}{path}", json={"session": self.session, **payload}, timeout=self.timeout)
+        response.raise_for_status()
+        return _parse(response)
+
+    def send_message(self, chat_id, text):
+        return self.post("/api/sendText", {"chatId": chat_id, "text": text})
+
+    def send_seen(self, chat_id, message_id, participant):
+        return self.post("/api/sendSeen", {"chatId": chat_id, "messageId": message_id, "participant": participant})
+
+    def start_typing(self, chat_id):
+        return self.post("/api/startTyping", {"chatId": chat_id})
+
+    def stop_typing(self, chat_id):
+        return self.post("/api/stopTyping", {"chatId": chat_id})
+
+    def close(self):
+        self._http.close()
+
+
+class AsyncWahaClient:
+    """Cliente assíncrono do WAHA sobre um httpx.AsyncClient compartilhado.
+
+    O httpx.AsyncClient fica preso ao loop em que foi criado, então o cliente
+    deve ser usado sempre do mesmo event loop (ex.: event_loop.get_loop()).
+    """
+
+    def __init__(self, base_url: str = WAHA_URL, session: str = WAHA_SESSION,
+                 timeout: float = 10.0, connect_timeout: float = 3.0,
+                 retries: int = 3, backoff: float = 0.5, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.retries = retries
+        self.backoff = backoff
+        self._http = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._http
+
+    async def post(self, path: str, payload: dict) -> dict:
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.post(path, json={"session": self.session, **payload})
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    response.raise_for_status()
+                    return _parse(response)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    async def send_message(self, chat_id, text):
+        return await self.post("/api/sendText", {"chatId": chat_id, "text": text})
+
+    async def send_seen(self, chat_id, message_id, participant):
+        return await self.post("/api/sendSeen", {"chatId": chat_id, "messageId": message_id, "participant": participant})
+
+    async def start_typing(self, chat_id):
+        return await self.post("/api/startTyping", {"chatId": chat_id})
+
+    async def stop_typing(self, chat_id):
+        return await self.post("/api/stopTyping", {"chatId": chat_id})
+
+    async def acknowledge(self, chat_id, message_id, participant):
+        """Marca como visto e começa a digitar de uma vez (o WAHA não tem
+        endpoint em lote, então as duas chamadas vão em paralelo no pool)"""
+        await asyncio.gather(
+            self.send_seen(chat_id, message_id, participant),
+            self.start_typing(chat_id),
+        )
+
+    @asynccontextmanager
+    async def typing_indicator(self, chat_id, message_id=None, participant=None, refresh=TYPING_REFRESH):
+        """Mantém o "digitando..." enquanto o bloco executa, renovando a cada
+        `refresh` segundos. Com message_id, também marca a mensagem como vista."""
+
+        iniciado = asyncio.Event()
+
+        async def manter_digitando():
+            try:
+                if message_id is not None:
+                    await self.acknowledge(chat_id, message_id, participant)
+                else:
+                    await self.start_typing(chat_id)
+            except Exception as e:
+                logger.warning(f"Erro ao indicar digitação: {e}")
+            iniciado.set()
+            while True:
+                await asyncio.sleep(refresh)
+                try:
+                    await self.start_typing(chat_id)
+                except Exception as e:
+                    logger.warning(f"Erro ao renovar digitação: {e}")
+
+        task = asyncio.create_task(manter_digitando())
+        try:
+            yield
+        finally:
+            # Respostas rápidas não podem cancelar o visto inicial no meio do
+            # envio; se a própria espera for cancelada, a task para mesmo assim
+            try:
+                await iniciado.wait()
+            finally:
+                task.cancel()
+            try:
+                await self.stop_typing(chat_id)
+            except Exception as e:
+                logger.warning(f"Erro ao parar digitação: {e}")
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import unicodedata
+
+from dotenv import load_dotenv
+
+from http_client import get_client, on_shutdown
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5")
+
+# O OpenWeather atualiza o tempo atual a cada ~10 min e a previsão a cada 3h
+WEATHER_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+FORECAST_TTL = float(os.getenv("FORECAST_CACHE_TTL", "1800"))
+
+cache = TTLCache(
+    maxsize=int(os.getenv("WEATHER_CACHE_SIZE", "256")),
+    ttl=WEATHER_TTL,
+    path=os.getenv("WEATHER_CACHE_FILE") or None,
+    snapshot_interval=float(os.getenv("WEATHER_CACHE_SNAPSHOT_INTERVAL", "60")),
+)
+# Snapshot final: entre dois snapshots o cache só é gravado no shutdown
+on_shutdown(cache.save)
+
+# Buscas em andamento por chave: chamadas concorrentes aguardam a mesma
+_inflight = {}
+coalesced = 0
+
+
+def normalize_city(city: str) -> str:
+    """'  Jundiaí ' e 'jundiai' viram a mesma chave"""
+    city = unicodedata.normalize("NFKD", city.strip().casefold())
+    return " ".join("".join(c for c in city if not unicodedata.combining(c)).split())
+
+
+def cache_key(kind: str, city: str, units: str, days: int = None) -> str:
+    key = f"{kind}|{normalize_city(city)}|{units}"
+    return key if days is None else f"{key}|{days}"
+
+
+async def _fetch(key: str, path: str, params: dict, ttl: float) -> dict:
+    params = {**params, "APPID": os.getenv("OPENWEATHER_API_KEY")}
+    response = await get_client().get(f"{OPENWEATHER_URL}/{path}", params=params)
+    data = response.json()
+    # Erros (cidade não encontrada, limite da API) não vão para o cache
+    if response.status_code == 200:
+        cache.set(key, data, ttl)
+    return data
+
+
+async def _single_flight(key: str, fetch):
+    """Executa fetch() uma vez por chave, mesmo com várias chamadas simultâneas"""
+    global coalesced
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        coalesced += 1
+    # shield: o cancelamento de um chamador não derruba a busca dos outros
+    return await asyncio.shield(task)
+
+
+async def current(city: str, units: str = "metric") -> dict:
+    """JSON do tempo atual (/weather), servido do cache enquanto válido"""
+    key = cache_key("weather", city, units)
+    data = cache.get(key)
+    if data is None:
+        data = await _single_flight(key, lambda: _fetch(key, "weather", {"q": city, "units": units}, WEATHER_TTL))
+    return data
+
+
+async def forecast(city: str, days: int, units: str = "metric") -> dict:
+    """JSON da previsão (/forecast) com 8 intervalos de 3h por dia"""
+    key = cache_key("forecast", city, units, days)
+    data = cache.get(key)
+    if data is None:
+        params = {"q": city, "cnt": days * 8, "units": units}
+        data = await _single_flight(key, lambda: _fetch(key, "forecast", params, FORECAST_TTL))
+    return data
+
+
+def stats() -> dict:
+    return {**cache.stats(), "coalesced": coalesced, "inflight": len(_inflight)}
@@ -1,90 +1,126 @@
-from flask import Flask, request
-import requests
-import asyncio
-import time
-
-import time
+from flask import Flask, request, jsonify
 from agents import Agent, Runner, gen_trace_id, trace, WebSearchTool
 from agents.model_settings import ModelSettings
-from agents.mcp import MCPServerStdio
 import os
 
-# Histórico de conversas por chat (ex.: { chat_id: [("User", msg), ("Assistant", msg), ...] })
-conversation_history = {}
+from agent_registry import AgentRegistry, ChatContext
+from conversation_store import ConversationStore
+from event_loop import get_loop
+from job_queue import JobQueue
+from mcp_pool import MCPServerPool
+from rate_limit import RateLimiter, current_reservation
+from waha import AsyncWahaClient
+
+# Histórico de conversas por chat (ex.: chat_id -> [("User", msg), ("Assistant", msg), ...]),
+# com tamanho limitado e descarte de chats parados; CONVERSATION_FILE grava um snapshot em disco
+conversation_history = ConversationStore(
+    max_messages=int(os.getenv("CONVERSATION_MAX_MESSAGES", "10")),
+    ttl=float(os.getenv("CONVERSATION_TTL", str(24 * 3600))),
+    max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", str(16 * 1024 * 1024))),
+    path=os.getenv("CONVERSATION_FILE") or None,
+)
 server_params = {
     "command": "python",
     "args": ["/home/pi/mcp/src/server/server.py"],
     "env": os.environ.copy(),
 }
+# Pool de servidores MCP mantidos quentes entre as mensagens
+mcp_pool = MCPServerPool(server_params)
+
+# Limites de chamadas ao modelo por contato e globais (RPM/TPM); acima do limite a
+# mensagem espera a vez na fila do chat em vez de ser descartada
+limiter = RateLimiter(
+    contact_rpm=float(os.getenv("LLM_CONTACT_RPM", "6")),
+    contact_burst=int(os.getenv("LLM_CONTACT_BURST", "3")),
+    rpm=float(os.getenv("LLM_RPM", "300")),
+    tpm=float(os.getenv("LLM_TPM", "150000")),
+)
+
+# Event loop persistente compartilhado por todas as requisições do webhook
+background = get_loop()
+
+# Cliente WAHA com conexões keep-alive, usado sempre a partir do loop compartilhado
+waha = AsyncWahaClient()
+
 # Flask app
 app = Flask(__name__)
 
-autorized = "5519971120828@c.us"
+INSTRUCTIONS = "Você é um assistente chatbot útil, respostas curtas e diretas. use ferramentas para informacoes atualizadas quando necessario. Histórico:\n"
 
+def instructions(ctx, agent) -> str:
+    # Instruções dinâmicas: o histórico vem do contexto de cada Runner.run
+    return INSTRUCTIONS + "\n".join(f"{role}: {msg}" for role, msg in ctx.context.history)
 
-# Função para enviar mensagem
-def send_message(chat_id, text):
-    response = requests.post(
-        "http://localhost:3000/api/sendText",
-        json={
-            "chatId": chat_id,
-            "text": text,
-            "session": "default",
-        },
-    )
-    response.raise_for_status()
-
-# Função para marcar como "visto"
-def send_seen(chat_id, message_id, participant):
-    response = requests.post(
-        "http://localhost:3000/api/sendSeen",
-        json={
-            "session": "default",
-            "chatId": chat_id,
-            "messageId": message_id,
-            "participant": participant,
-        },
-    )
-    response.raise_for_status()
-
-# Simula digitação
-def typing(chat_id, seconds):
-    requests.post("http://localhost:3000/api/startTyping", json={"session": "default", "chatId": chat_id})
-    time.sleep(seconds)
-    requests.post("http://localhost:3000/api/stopTyping", json={"session": "default", "chatId": chat_id})
+# Agente criado uma vez no startup; cada servidor MCP do pool ganha um clone fixo
+agent_registry = AgentRegistry(Agent(
+    name="Assistant",
+    instructions=instructions,
+    model="gpt-4o-mini",
+    tools=[WebSearchTool()],
+    model_settings=ModelSettings(tool_choice="auto"),
+), maxsize=2 * mcp_pool.size)
+
+autorized = "5519971120828@c.us"
 
 
 async def process_llm(chat_id, user_message):
-    
-    async with MCPServerStdio(params=server_params) as mcp_server:
+    async with mcp_pool.acquire() as mcp_server:
         # Atualiza o histórico da conversa para esse chat
-        if chat_id not in conversation_history:
-            conversation_history[chat_id] = []
-        conversation_history[chat_id].append(("User", user_message))
-        
-        # Define as instruções usando as últimas 3 interações (ou toda a história, se preferir)
-        instructions = "Você é um assistente chatbot útil, respostas curtas e diretas. use ferramentas para informacoes atualizadas quando necessario. Histórico:\n" + "\n".join(
-            f"{role}: {msg}" for role, msg in conversation_history[chat_id][-3:]
-        )
+        conversation_history.append(chat_id, "User", user_message)
         
-        # Instancia o agente
-        agent = Agent(
-            name="Assistant",
-            instructions=instructions,
-            model="gpt-4o-mini",
-            tools=[WebSearchTool()],
-            mcp_servers=[mcp_server],  # Se não for necessário usar um subprocesso com MCPServerStdio, deixe vazio
-            model_settings=ModelSettings(tool_choice="auto"),
-        )
+        # Instruções usam as últimas 3 interações (ou toda a história, se preferir)
+        context = ChatContext(chat_id, conversation_history.history(chat_id, 3))
         
         # Processa a query com o agente (usando trace para log, se desejar)
-        with trace("Agent interaction", trace_id=gen_trace_id()):
-            result = await Runner.run(agent, user_message)
+        used_tokens = None
+        try:
+            with trace("Agent interaction", trace_id=gen_trace_id()):
+                result = await Runner.run(agent_registry.for_server(mcp_server), user_message, context=context)
+            used_tokens = result.context_wrapper.usage.total_tokens
+        finally:
+            # Também em erro/cancelamento: a reserva não pode ficar presa no TPM
+            limiter.settle(current_reservation.get(), used_tokens)
         response_text = result.final_output
         
-        conversation_history[chat_id].append(("Assistant", response_text))
+        conversation_history.append(chat_id, "Assistant", response_text)
         return response_text
 
+async def handle_message(job):
+    chat_id = job["chat_id"]
+    # O visto e o primeiro "digitando..." saíram no aceite; o indicador segue
+    # renovado em paralelo com o LLM, parando só depois do envio da resposta
+    async with waha.typing_indicator(chat_id):
+        try:
+            response_text = await process_llm(chat_id, job["text"])
+        except Exception as e:
+            print("Erro ao processar LLM:", e)
+            response_text = "Desculpe, ocorreu um erro ao processar sua mensagem."
+
+        # Envia a resposta de volta para o usuário
+        await waha.send_message(chat_id, response_text)
+
+# Mensagens que se acumularam enquanto o chat esperava o limite viram um turno só
+def merge_messages(jobs):
+    return dict(jobs[-1], text="\n".join(job["text"] for job in jobs))
+
+# Fila por chat: o webhook só enfileira e responde; cada chat é atendido em ordem,
+# um de cada vez, e o limiter adia chats acima do limite sem segurar worker
+job_queue = JobQueue(
+    handle_message,
+    background,
+    workers=int(os.getenv("WORKERS", str(mcp_pool.size))),
+    maxsize=int(os.getenv("QUEUE_MAXSIZE", "100")),
+    per_chat=int(os.getenv("CHAT_QUEUE_LIMIT", "10")),
+    limiter=limiter,
+    text=lambda job: job["text"],
+    merge=merge_messages,
+)
+# Na ordem de registro: a fila drena antes de fechar pool, histórico e cliente WAHA
+background.on_shutdown(job_queue.close)
+background.on_shutdown(mcp_pool.close)
+background.on_shutdown(conversation_history.close)
+background.on_shutdown(waha.aclose)
+
 @app.route("/webhook", methods=["POST"])
 def whatsapp_webhook():
     data = request.get_json()
@@ -105,25 +141,28 @@ def whatsapp_webhook():
     if not text or not chat_id:
         return "Invalid message", 400
     
-    # Marca como visto
-    send_seen(chat_id=chat_id, message_id=message_id, participant=participant)
-    
-    if chat_id == autorized:
-        typing(chat_id, 2)
-        # Chama a função async para processar o LLM e obter a resposta
-        try:
-            response_text = asyncio.run(process_llm(chat_id, text))
-        except Exception as e:
-            print("Erro ao processar LLM:", e)
-            response_text = "Desculpe, ocorreu um erro ao processar sua mensagem."
-
-        # Envia a resposta de volta para o usuário
-        send_message(chat_id, response_text)
-
-
-    
+    if chat_id != autorized:
+        # Só marca como visto, sem esperar o WAHA
+        background.submit(waha.send_seen(chat_id, message_id, participant))
+        return "OK", 200
+
+    # Responde ao WAHA na hora: visto + "digitando..." saem já, e o LLM roda na
+    # fila em background (também quando o contato está acima do limite)
+    job = {"chat_id": chat_id, "text": text, "message_id": message_id, "participant": participant}
+    if not job_queue.submit(chat_id, job):
+        return jsonify({"status": "erro", "detalhe": "Fila cheia"}), 503, {"Retry-After": "5"}
+    background.submit(waha.acknowledge(chat_id, message_id, participant))
     return "OK", 200
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "job_queue": job_queue.stats(),
+        "mcp_pool": mcp_pool.stats(),
+        "conversation_history": conversation_history.stats(),
+        "rate_limit": limiter.stats(),
+    })
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
 
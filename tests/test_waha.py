@@ -0,0 +1,206 @@
+"""Clientes do WAHA: conexões reaproveitadas e quais falhas são repetidas.
+
+Sobe um WAHA falso local que conta conexões e requisições e pode responder
+503 ou demorar além do timeout de leitura.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+
+BACKOFF = 0.02
+READ_TIMEOUT = 0.2
+
+
+class FakeWaha(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    hits = 0
+    fail_next = 0  # quantas das próximas requisições recebem 503
+    delay = 0.0
+    lock = threading.Lock()
+
+    def setup(self):
+        with FakeWaha.lock:
+            FakeWaha.connections += 1
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with FakeWaha.lock:
+            FakeWaha.hits += 1
+            fail = FakeWaha.fail_next > 0
+            if fail:
+                FakeWaha.fail_next -= 1
+        time.sleep(FakeWaha.delay)
+        body = json.dumps({"id": "ok"}).encode()
+        self.send_response(503 if fail else 201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def reset():
+    FakeWaha.connections = 0
+    FakeWaha.hits = 0
+    FakeWaha.fail_next = 0
+    FakeWaha.delay = 0.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_later(port: int, after: float) -> list:
+    """Sobe um WAHA falso em `port` só depois de `after` segundos (até lá a conexão é recusada)"""
+    started = []
+
+    def start():
+        server = ThreadingHTTPServer(("127.0.0.1", port), FakeWaha)
+        started.append(server)
+        server.serve_forever()
+
+    threading.Timer(after, start).start()
+    return started
+
+
+def stop_later(started: list):
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+upstream = None
+url = None
+waha = None
+
+
+def setUpModule():
+    global upstream, url, waha
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), FakeWaha)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{upstream.server_port}"
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+    import waha as module
+    waha = module
+
+
+def tearDownModule():
+    upstream.shutdown()
+    upstream.server_close()
+
+
+class WahaClientTest(unittest.TestCase):
+    def setUp(self):
+        reset()
+        self.client = waha.WahaClient(url, retries=3, backoff=BACKOFF, timeout=READ_TIMEOUT)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_reuses_connection(self):
+        for i in range(10):
+            self.assertEqual(self.client.send_message("5511999999999@c.us", f"oi {i}"), {"id": "ok"})
+
+        self.assertEqual(FakeWaha.hits, 10)
+        self.assertLess(FakeWaha.connections, FakeWaha.hits)
+
+    def test_retries_on_503(self):
+        FakeWaha.fail_next = 2
+
+        self.assertEqual(self.client.send_message("5511999999999@c.us", "oi"), {"id": "ok"})
+        self.assertEqual(FakeWaha.hits, 3)
+
+    def test_gives_up_after_retries(self):
+        FakeWaha.fail_next = 10
+
+        with self.assertRaises(requests.HTTPError):
+            self.client.send_message("5511999999999@c.us", "oi")
+        self.assertEqual(FakeWaha.hits, 4)
+
+    def test_retries_on_connection_refused(self):
+        port = free_port()
+        started = serve_later(port, 0.1)
+        client = waha.WahaClient(f"http://127.0.0.1:{port}", retries=5, backoff=0.05)
+        try:
+            self.assertEqual(client.send_message("5511999999999@c.us", "oi"), {"id": "ok"})
+        finally:
+            client.close()
+            stop_later(started)
+        self.assertEqual(FakeWaha.hits, 1)
+
+    def test_no_retry_on_read_timeout(self):
+        FakeWaha.delay = READ_TIMEOUT * 2
+
+        # O WAHA pode já ter enviado a mensagem: repetir duplicaria a resposta
+        with self.assertRaises(requests.ConnectionError):
+            self.client.send_message("5511999999999@c.us", "oi")
+        self.assertEqual(FakeWaha.hits, 1)
+
+
+class AsyncWahaClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        reset()
+        # Um cliente por teste: cada teste roda no seu próprio event loop
+        self.client = waha.AsyncWahaClient(url, retries=3, backoff=BACKOFF, timeout=READ_TIMEOUT, pool_size=4)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_reuses_connections(self):
+        for _ in range(3):
+            await asyncio.gather(*(self.client.send_message("5511999999999@c.us", f"oi {i}") for i in range(8)))
+
+        self.assertEqual(FakeWaha.hits, 24)
+        self.assertLessEqual(FakeWaha.connections, 4)
+
+    async def test_retries_on_503(self):
+        FakeWaha.fail_next = 2
+
+        self.assertEqual(await self.client.send_message("5511999999999@c.us", "oi"), {"id": "ok"})
+        self.assertEqual(FakeWaha.hits, 3)
+
+    async def test_gives_up_after_retries(self):
+        FakeWaha.fail_next = 10
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.client.send_message("5511999999999@c.us", "oi")
+        self.assertEqual(FakeWaha.hits, 4)
+
+    async def test_retries_on_connection_refused(self):
+        port = free_port()
+        started = serve_later(port, 0.1)
+        client = waha.AsyncWahaClient(f"http://127.0.0.1:{port}", retries=5, backoff=0.05)
+        try:
+            self.assertEqual(await client.send_message("5511999999999@c.us", "oi"), {"id": "ok"})
+        finally:
+            await client.aclose()
+            stop_later(started)
+        self.assertEqual(FakeWaha.hits, 1)
+
+    async def test_no_retry_on_read_timeout(self):
+        FakeWaha.delay = READ_TIMEOUT * 2
+
+        with self.assertRaises(httpx.ReadTimeout):
+            await self.client.send_message("5511999999999@c.us", "oi")
+        self.assertEqual(FakeWaha.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
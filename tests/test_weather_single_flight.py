@@ -0,0 +1,115 @@
+"""Buscas simultâneas do mesmo tempo viram uma única requisição ao OpenWeather.
+
+Sobe um OpenWeather falso local (lento de propósito, para as chamadas se
+sobreporem) e conta quantas requisições chegam até ele.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+WEATHER = {
+    "main": {"temp": 21.5, "humidity": 60},
+    "weather": [{"description": "céu limpo"}],
+    "wind": {"speed": 2.1},
+}
+UPSTREAM_DELAY = 0.2
+
+
+class FakeOpenWeather(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with FakeOpenWeather.lock:
+            FakeOpenWeather.hits += 1
+        time.sleep(UPSTREAM_DELAY)
+        body = json.dumps(WEATHER).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+upstream = None
+weather = None
+
+
+def setUpModule():
+    global upstream, weather
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenWeather)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    # Lidos no import do módulo; cache desligado para testar só o single-flight
+    os.environ["OPENWEATHER_URL"] = f"http://127.0.0.1:{upstream.server_port}"
+    os.environ["WEATHER_CACHE_SIZE"] = "0"
+    os.environ.pop("WEATHER_CACHE_FILE", None)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+    import weather as module
+    weather = module
+
+
+def tearDownModule():
+    upstream.shutdown()
+    upstream.server_close()
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        FakeOpenWeather.hits = 0
+        weather.coalesced = 0
+        # Um cliente por teste: cada teste roda no seu próprio event loop
+        self.client = httpx.AsyncClient()
+        weather.get_client = lambda: self.client
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_concurrent_calls_make_one_upstream_request(self):
+        cities = ["Jundiaí", "jundiai", "  JUNDIAI "] * 7
+        results = await asyncio.gather(*(weather.current(city) for city in cities))
+
+        self.assertEqual(FakeOpenWeather.hits, 1)
+        self.assertEqual(weather.coalesced, len(cities) - 1)
+        self.assertTrue(all(result == WEATHER for result in results))
+        self.assertEqual(weather.stats()["inflight"], 0)
+
+    async def test_different_keys_are_not_coalesced(self):
+        await asyncio.gather(weather.current("Jundiai"), weather.current("Campinas"), weather.current("Jundiai", "imperial"))
+
+        self.assertEqual(FakeOpenWeather.hits, 3)
+        self.assertEqual(weather.coalesced, 0)
+
+    async def test_cancelled_caller_does_not_abort_shared_fetch(self):
+        first = asyncio.create_task(weather.current("Jundiai"))
+        second = asyncio.create_task(weather.current("Jundiai"))
+        await asyncio.sleep(UPSTREAM_DELAY / 4)
+        first.cancel()
+
+        self.assertEqual(await second, WEATHER)
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertEqual(FakeOpenWeather.hits, 1)
+
+    async def test_next_call_after_completion_fetches_again(self):
+        await weather.current("Jundiai")
+        await weather.current("Jundiai")
+
+        # Sem cache, o single-flight só junta chamadas sobrepostas
+        self.assertEqual(FakeOpenWeather.hits, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,133 +1,128 @@
 import os
 import json
-import requests
 import datetime
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template, redirect, url_for
-from openai import OpenAI
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, stream_with_context
+from openai import AsyncOpenAI
 
 import asyncio
 
-import time
+import sys
 from agents import Agent, Runner, gen_trace_id, trace, WebSearchTool
 from agents.model_settings import ModelSettings
-from agents.mcp import MCPServerStdio
 import os
+
+# Módulos compartilhados ficam em src/server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+from agent_registry import AgentRegistry, ChatContext
+from event_loop import get_loop
+from mcp_pool import MCPServerPool
+from job_queue import JobQueue
+from contacts import ContactIndex
+from drop_counter import DropCounter
+from log_writer import LogWriter
+from message_store import MessageStore
+from message_chunker import paced_chunks
+from conversation_store import ConversationStore
+from rate_limit import RateLimiter, current_reservation
+from waha import AsyncWahaClient
  
 load_dotenv()
-client = OpenAI()
+client = AsyncOpenAI()
 
 server_params = {
     "command": "python",
     "args": ["/home/pi/mcp/whatsserver/server.py"],
     "env": os.environ.copy(),
 }
+# Pool de servidores MCP reaproveitados entre as mensagens (tamanho via MCP_POOL_SIZE)
+mcp_pool = MCPServerPool(server_params)
 
 app = Flask(__name__)
 
 # Arquivos de configuração e log unificado
 ALLOWED_CONTACTS_FILE = "allowed_contacts.txt"
 MESSAGES_LOG_FILE = "messages.log"  # Unifica mensagens recebidas e respostas (JSON line)
+MESSAGES_DB_FILE = "messages.db"  # Mesmo conteúdo do log, indexado por remetente/data
 CONFIG_FILE = "config.txt"
+LOG_PAGE_SIZE = 50  # Entradas por página do log na interface
+LOG_VIEW_LIMIT = 200  # Máximo de entradas por página da API
+HISTORY_TURNS = 5  # Interações (pergunta + resposta) lembradas por chat
+HISTORY_MAX_CHATS = 1000  # Chats carregados do banco no startup
+HISTORY_TTL = 7 * 24 * 3600  # Chats parados há mais tempo saem da memória
+HISTORY_MAX_BYTES = 8 * 1024 * 1024  # Teto de memória do histórico
+
+# Respostas internas do webhook (não são turnos da conversa)
+RESPOSTA_VAZIA = "mensagem texto vazia"
+RESPOSTA_NAO_AUTORIZADO = "Respostas desabilitadas ou remetente não autorizado."
+RESPOSTAS_INTERNAS = ("", RESPOSTA_VAZIA, RESPOSTA_NAO_AUTORIZADO, "Dados inválidos.")
+
+# Na primeira execução importa o messages.log existente para o banco
+message_store = MessageStore(MESSAGES_DB_FILE)
+message_store.import_jsonl(MESSAGES_LOG_FILE)
+
+# Histórico recente de cada chat em memória (LRU entre chats), aquecido a partir do banco
+historico = ConversationStore(
+    max_messages=2 * HISTORY_TURNS,
+    max_total=2 * HISTORY_TURNS * HISTORY_MAX_CHATS,
+    ttl=HISTORY_TTL,
+    max_bytes=HISTORY_MAX_BYTES,
+)
+
+def _epoch(timestamp):
+    try:
+        return datetime.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def aquecer_historico():
+    # Do chat menos para o mais recente, assim o LRU fica na ordem certa; o
+    # horário original de cada turno faz os chats antigos expirarem pelo TTL
+    # Chaves no formato do chat_id do webhook, mesmo para entradas antigas gravadas
+    # só com o número (senão o reconstruir_historico nunca as encontra)
+    for chat_id in reversed(message_store.recent_senders(HISTORY_MAX_CHATS)):
+        for entry in message_store.last_for(chat_id, HISTORY_TURNS, exclude_responses=RESPOSTAS_INTERNAS):
+            at = _epoch(entry.get("timestamp"))
+            historico.append(chat_id, "user", entry.get("user_message", ""), at)
+            historico.append(chat_id, "assistant", entry.get("assistant_response", ""), at)
+
+aquecer_historico()
+
+def instrucoes_agente(ctx, agent) -> str:
+    # Instruções dinâmicas: o histórico vem do contexto de cada Runner.run
+    return "Você é um assistente chatbot útil, use ferramentas para informacoes atualizadas quando necessario. Histórico:\n" + "\n".join(
+        f"{role}: {msg}" for role, msg in ctx.context.history
+    )
+
+# Agente criado uma vez no startup; cada servidor MCP do pool ganha um clone fixo
+agentes = AgentRegistry(Agent(
+    name="Assistant",
+    instructions=instrucoes_agente,
+    model="gpt-4o-mini",
+    tools=[WebSearchTool()],
+    model_settings=ModelSettings(tool_choice="auto"),
+), maxsize=2 * mcp_pool.size)
 
-conversation_history = {}
 async def process_llm(chat_id, user_message):
     
-    async with MCPServerStdio(params=server_params) as mcp_server:
+    async with mcp_pool.acquire() as mcp_server:
         # Atualiza o histórico da conversa para esse chat
-        if chat_id not in conversation_history:
-            conversation_history[chat_id] = []
-        conversation_history[chat_id].append(("User", user_message))
+        historico.append(chat_id, "user", user_message)
         
-        # Define as instruções usando as últimas 3 interações (ou toda a história, se preferir)
-        instructions = "Você é um assistente chatbot útil, use ferramentas para informacoes atualizadas quando necessario. Histórico:\n" + "\n".join(
-            
-            
-            f"{role}: {msg}" for role, msg in conversation_history[chat_id][-3:]
-        )
-        
-        # Instancia o agente
-        agent = Agent(
-            name="Assistant",
-            instructions=instructions,
-            model="gpt-4o-mini",
-            tools=[WebSearchTool()],
-            mcp_servers=[mcp_server],  # Se não for necessário usar um subprocesso com MCPServerStdio, deixe vazio
-            model_settings=ModelSettings(tool_choice="auto"),
-        )
+        # Instruções usam as últimas 3 interações (ou toda a história, se preferir)
+        context = ChatContext(chat_id, historico.history(chat_id, 3))
         
         # Processa a query com o agente (usando trace para log, se desejar)
         with trace("Agent interaction", trace_id=gen_trace_id()):
-            result = await Runner.run(agent, user_message)
+            result = await Runner.run(agentes.for_server(mcp_server), user_message, context=context)
         response_text = result.final_output
         
-        conversation_history[chat_id].append(("Assistant", response_text))
+        historico.append(chat_id, "assistant", response_text)
         return response_text
 
-# Função para enviar mensagem
-def send_message(chat_id, text):
-    response = requests.post(
-        "http://localhost:3000/api/sendText",
-        json={
-            "chatId": chat_id,
-            "text": text,
-            "session": "default",
-        },
-    )
-    response.raise_for_status()
-
-# Função para marcar como "visto"
-def send_seen(chat_id, message_id, participant):
-    response = requests.post(
-        "http://localhost:3000/api/sendSeen",
-        json={
-            "session": "default",
-            "chatId": chat_id,
-            "messageId": message_id,
-            "participant": participant,
-        },
-    )
-    response.raise_for_status()
-
-# Simula digitação
-def typing(chat_id, seconds):
-    requests.post("http://localhost:3000/api/startTyping", json={"session": "default", "chatId": chat_id})
-    time.sleep(seconds)
-    requests.post("http://localhost:3000/api/stopTyping", json={"session": "default", "chatId": chat_id})
-
-
-
-# Funções para gerenciar allowed contacts (formato: número,nome,enabled)
-def load_allowed_contacts():
-    contacts = []
-    if os.path.exists(ALLOWED_CONTACTS_FILE):
-        with open(ALLOWED_CONTACTS_FILE, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    parts = line.split(",")
-                    if len(parts) == 3:
-                        contact = parts[0].strip()
-                        name = parts[1].strip()
-                        enabled = parts[2].strip().lower() == "true"
-                        contacts.append({"contact": contact, "name": name, "enabled": enabled})
-                    elif len(parts) == 2:
-                        # Se só tem número e enabled, usamos o número como nome
-                        contact = parts[0].strip()
-                        enabled = parts[1].strip().lower() == "true"
-                        contacts.append({"contact": contact, "name": contact, "enabled": enabled})
-                    else:
-                        contacts.append({"contact": line, "name": line, "enabled": True})
-    else:
-        contacts = [{"contact": "55191111111111", "name": "user-change", "enabled": True}]
-    return contacts
-
-def save_allowed_contacts(contacts):
-    with open(ALLOWED_CONTACTS_FILE, "w") as f:
-        for c in contacts:
-            f.write(f"{c['contact']},{c.get('name', c['contact'])},{str(c['enabled']).lower()}\n")
-
-allowed_contacts = load_allowed_contacts()
+# Contatos permitidos (formato: número,nome,enabled), indexados por número e
+# recarregados sozinhos quando o allowed_contacts.txt muda no disco
+contacts = ContactIndex(ALLOWED_CONTACTS_FILE)
 
 
 # Funções para gerenciar configuração global
@@ -152,8 +147,8 @@ config = load_config()
 API_KEY_TEXTMEBOT = os.getenv("API_KEY_TEXTMEBOT")
 # Envio de mensagens via WhatsApp usando a API do TextMeBot
 
-# Função para reconstruir o histórico (últimas 5 interações) a partir do log unificado
-def reconstruir_historico():
+# Função para reconstruir o histórico (últimas 5 interações) do próprio chat
+def reconstruir_historico(chat_id):
     conversation = []
     # Mantém o prompt inicial
     conversation.append({
@@ -171,33 +166,36 @@ def reconstruir_historico():
             "Não revele que você é um chatbot ou usa IA. "
         )
     })
-    # Tenta ler o log e pega as últimas 5 interações
-    if os.path.exists(MESSAGES_LOG_FILE):
-        with open(MESSAGES_LOG_FILE, "r") as f:
-            linhas = f.readlines()
-        # Considera cada linha como uma interação (JSON)
-        ultimas = linhas[-5:]
-        for linha in ultimas:
-            try:
-                entry = json.loads(linha)
-                # Adiciona a mensagem do usuário
-                conversation.append({
-                    "role": "user",
-                    "content": entry.get("user_message", "")
-                })
-                # Adiciona a resposta do assistente
-                conversation.append({
-                    "role": "assistant",
-                    "content": entry.get("assistant_response", "")
-                })
-            except Exception as e:
-                print("Erro ao parsear linha do log:", e)
-                continue
+    # Últimas interações só deste chat (ring buffer em memória, sem consultar o banco)
+    for role, content in historico.history(chat_id):
+        conversation.append({"role": role, "content": content})
     return conversation
 
-# OpenAI responses API com histórico reconstruído a partir do log unificado
-def responder_whatsapp(mensagem: str, nome_remetente: str) -> str:
-    conversation = reconstruir_historico()
+# Parâmetros da chamada ao modelo (iguais com e sem streaming)
+OPENAI_PARAMS = dict(
+     model="gpt-4o-mini",
+     text={"format": {"type": "text"}},
+     reasoning={},
+     tools=[
+         {
+             "type": "web_search_preview",
+             "user_location": {
+                 "type": "approximate",
+                 "country": "BR",
+                 "region": "São Paulo",
+                 "city": "Jundiaí"
+             },
+             "search_context_size": "low"
+         }
+     ],
+     temperature=0.5,
+     max_output_tokens=2048,
+     top_p=1,
+     store=True
+)
+
+def montar_conversa(mensagem: str, nome_remetente: str, chat_id: str) -> list:
+    conversation = reconstruir_historico(chat_id)
     # Adiciona uma mensagem informando o nome do remetente (caso queira que o modelo saiba)
     conversation.append({
         "role": "system",
@@ -208,45 +206,170 @@ def responder_whatsapp(mensagem: str, nome_remetente: str) -> str:
         "role": "user",
         "content": mensagem
     })
-    response = client.responses.create(
-         model="gpt-4o-mini",
-         input=conversation,
-         text={"format": {"type": "text"}},
-         reasoning={},
-         tools=[
-             {
-                 "type": "web_search_preview",
-                 "user_location": {
-                     "type": "approximate",
-                     "country": "BR",
-                     "region": "São Paulo",
-                     "city": "Jundiaí"
-                 },
-                 "search_context_size": "low"
-             }
-         ],
-         temperature=0.5,
-         max_output_tokens=2048,
-         top_p=1,
-         store=True
-    )
+    return conversation
+
+# OpenAI responses API com o histórico do chat
+async def responder_whatsapp(mensagem: str, nome_remetente: str, chat_id: str) -> str:
+    usados = None
+    try:
+        response = await client.responses.create(input=montar_conversa(mensagem, nome_remetente, chat_id), **OPENAI_PARAMS)
+        usados = response.usage.total_tokens
+    finally:
+        # Também em erro/cancelamento: a reserva não pode ficar presa no TPM
+        limitador.settle(current_reservation.get(), usados)
     resposta = response.output_text
     print(resposta)
     return resposta
 
+# Mesma chamada em streaming: gera os pedaços de texto conforme o modelo produz
+async def responder_whatsapp_stream(mensagem: str, nome_remetente: str, chat_id: str):
+    usados = None
+    try:
+        stream = await client.responses.create(input=montar_conversa(mensagem, nome_remetente, chat_id), stream=True, **OPENAI_PARAMS)
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type in ("response.completed", "response.failed", "response.incomplete"):
+                if event.response.usage:
+                    usados = event.response.usage.total_tokens
+                if event.type != "response.completed" and event.response.error:
+                    raise RuntimeError(f"Resposta do modelo falhou: {event.response.error.message}")
+    finally:
+        # Stream que falha ou é abandonado no meio também devolve a reserva
+        limitador.settle(current_reservation.get(), usados)
+
+def entrada_log(payload, resposta="", descartados=None):
+    """Entrada unificada do log para a mensagem recebida"""
+    entry = {
+        "from": payload.get("from", ""),
+        "from_name": payload.get("pushName", "Desconhecido"),
+        "to": payload.get("to", ""),
+        "type": payload.get("type", ""),
+        "user_message": payload.get("body", ""),
+        "assistant_response": resposta,
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if descartados:
+        # Mensagens do mesmo remetente descartadas sem log desde a última linha
+        entry["dropped_since_last"] = descartados
+    return entry
+
+def registrar_log(log_entry):
+    # Registra a entrada unificada no log (cada linha é um JSON) e no banco indexado;
+    # só enfileira, quem grava em lote é o log_writer
+    log_writer.write(log_entry)
+
+# Modo streaming: cada frase/parágrafo completo vai para o WhatsApp assim que
+# fica pronto, juntando pedaços pequenos e respeitando um intervalo entre envios
+async def enviar_em_partes(chat_id, job) -> str:
+    partes = []
+    deltas = responder_whatsapp_stream(job["mensagem"], job["from_name"], chat_id)
+    async for parte in paced_chunks(
+        deltas,
+        min_chars=int(config.get("stream_min_chars", "80")),
+        interval=float(config.get("stream_interval", "1.5")),
+    ):
+        # Primeira parte enviada: mensagens novas não cancelam mais esta resposta
+        job_queue.commit(chat_id)
+        await waha.send_message(chat_id, f"🤖: {parte}")
+        partes.append(parte)
+    resposta = "\n".join(partes)
+    print(resposta)
+    return resposta
+
+# Mensagens em sequência do mesmo chat (janela de debounce ou espera pelo limite)
+# viram um turno só
+def juntar_mensagens(jobs):
+    job = dict(jobs[-1])
+    job["mensagem"] = "\n".join(j["mensagem"] for j in jobs)
+    job["log_entry"] = dict(job["log_entry"], user_message=job["mensagem"])
+    return job
+
+# Processamento em background de uma mensagem autorizada (executado pelos workers da fila)
+async def processar_mensagem(job):
+    chat_id = job["chat_id"]
+
+    # O visto e o primeiro "digitando..." saíram no aceite (antes do debounce);
+    # aqui o indicador é renovado em paralelo com o modelo, parando só depois
+    # do envio da resposta
+    async with waha.typing_indicator(chat_id):
+        if config.get("stream_responses", "false") == "true":
+            resposta = await enviar_em_partes(chat_id, job)
+        else:
+            resposta = await responder_whatsapp(job["mensagem"], job["from_name"], chat_id)
+
+            # Envia a resposta de volta para o usuário (a partir daqui não é mais cancelada)
+            job_queue.commit(chat_id)
+            await waha.send_message(chat_id, f"🤖: {resposta}")
+
+    # A fila serializa cada chat, então os turnos entram na ordem certa
+    historico.append(chat_id, "user", job["mensagem"])
+    historico.append(chat_id, "assistant", resposta)
+
+    log_entry = job["log_entry"]
+    log_entry["assistant_response"] = resposta
+    registrar_log(log_entry)
+
+background = get_loop()
+
+# Escritor único do messages.log + banco, em lote e com rotação (segmentos antigos em .gz)
+log_writer = LogWriter(
+    MESSAGES_LOG_FILE,
+    background,
+    store=message_store,
+    batch_size=int(config.get("log_batch_size", "50")),
+    flush_interval=float(config.get("log_flush_interval", "1.0")),
+    max_bytes=int(config.get("log_max_bytes", str(5 * 1024 * 1024))),
+    backups=int(config.get("log_backups", "5")),
+)
+
+# Limites de chamadas ao modelo: por contato (rajada + por minuto) e globais (RPM/TPM).
+# Mensagens acima do limite esperam na fila do chat, nunca são descartadas
+limitador = RateLimiter(
+    contact_rpm=float(config.get("contact_rpm", "6")),
+    contact_burst=int(config.get("contact_burst", "3")),
+    rpm=float(config.get("llm_rpm", "300")),
+    tpm=float(config.get("llm_tpm", "150000")),
+)
+
+# Fila de mensagens: o webhook só enfileira e os workers processam no loop compartilhado.
+# Chats diferentes rodam em paralelo (até `workers`), cada chat um de cada vez;
+# mensagens com menos de `debounce_ms` entre si são respondidas juntas
+waha = AsyncWahaClient()
+job_queue = JobQueue(
+    processar_mensagem,
+    background,
+    workers=int(config.get("workers", "4")),
+    maxsize=int(config.get("queue_maxsize", "100")),
+    per_chat=int(config.get("chat_queue_limit", "10")),
+    limiter=limitador,
+    text=lambda job: job["mensagem"],
+    merge=juntar_mensagens,
+    debounce=int(config.get("debounce_ms", "1500")) / 1000,
+)
+background.on_shutdown(job_queue.close)
+background.on_shutdown(log_writer.close)  # depois da fila: grava o log das últimas respostas
+background.on_shutdown(mcp_pool.close)
+background.on_shutdown(waha.aclose)
+
+# Tráfego descartado no webhook: só contadores, com log amostrado por remetente
+descartes = DropCounter(log_interval=float(config.get("drop_log_interval", "60")))
+
 # Interface de configuração – rota principal
 @app.route("/", methods=["GET", "POST"])
 def index():
-    global config, allowed_contacts
+    global config
     if request.method == "POST":
         # Atualiza a configuração global
         global_enable = request.form.get("enable_responses", "off")
         config["enable_responses"] = "true" if global_enable == "on" else "false"
         
-        # Atualiza cada contato individual (checkbox com nome: enabled_<número>)
-        for c in allowed_contacts:
-            checkbox_name = f"enabled_{c['contact']}"
-            c["enabled"] = True if request.form.get(checkbox_name) == "on" else False
+        # Atualiza cada contato individual (checkbox com nome: enabled_<número>);
+        # monta uma lista nova, o snapshot em uso pelo webhook não é alterado
+        allowed_contacts = [
+            dict(c, enabled=request.form.get(f"enabled_{c['contact']}") == "on")
+            for c in contacts.all()
+        ]
         
         # Exclusão de contato (se enviado no campo delete_contact)
         delete_contact = request.form.get("delete_contact", "").strip()
@@ -257,120 +380,133 @@ def index():
         new_contact = request.form.get("new_contact", "").strip()
         new_contact_name = request.form.get("new_contact_name", "").strip()
         if new_contact:
-            if all(new_contact != c["contact"] for c in allowed_contacts):
-                if len(allowed_contacts) < 10:
-                    if not new_contact_name:
-                        new_contact_name = new_contact
-                    allowed_contacts.append({"contact": new_contact, "name": new_contact_name, "enabled": True})
-                else:
-                    return redirect(url_for("index", message="Limite de 10 contatos atingido."))
+            if contacts.get(new_contact) is None:
+                if not new_contact_name:
+                    new_contact_name = new_contact
+                allowed_contacts.append({"contact": new_contact, "name": new_contact_name, "enabled": True})
         
         save_config(config)
-        save_allowed_contacts(allowed_contacts)
+        contacts.save(allowed_contacts)
         return redirect(url_for("index", message="Configurações salvas."))
     
     msg = request.args.get("message", "")
-    # Lê o log unificado para exibição na interface
-    log_sent_content = ""
-    if os.path.exists(MESSAGES_LOG_FILE):
-        with open(MESSAGES_LOG_FILE, "r") as f:
-            linhas = f.readlines()
-        log_entries = []
-        for linha in linhas:
-            try:
-                entry = json.loads(linha)
-                log_entries.append(entry)
-            except Exception as e:
-                print("Erro ao parsear log:", e)
-        # Converte os logs para uma string formatada (você pode customizar o layout)
-        log_sent_content = "\n".join(json.dumps(entry, indent=2, ensure_ascii=False) for entry in log_entries)
-    else:
-        log_sent_content = "Nenhuma mensagem registrada."
-    
-    return render_template("index.html", config=config, allowed_contacts=allowed_contacts, message=msg, log_sent_content=log_sent_content)
+    # O log não vem mais na página: o script.js busca em /api/messages
+    return render_template("index.html", config=config, allowed_contacts=contacts.all(), message=msg, log_page_size=LOG_PAGE_SIZE)
+
+def _filtros_log(args):
+    """Filtros de contato e data (AAAA-MM-DD) da query string"""
+    filtros = {"contact": args.get("contact", "").strip() or None}
+    for campo in ("since", "until"):
+        valor = args.get(campo, "").strip() or None
+        if valor:
+            datetime.datetime.fromisoformat(valor)  # ValueError se inválida
+        filtros[campo] = valor
+    return filtros
+
+# Log paginado: mais novas primeiro, cursor = id da última entrada recebida
+@app.route("/api/messages", methods=["GET"])
+def api_messages():
+    try:
+        filtros = _filtros_log(request.args)
+        before = request.args.get("before", type=int)
+        limit = min(max(request.args.get("limit", LOG_PAGE_SIZE, type=int), 1), LOG_VIEW_LIMIT)
+    except ValueError:
+        return jsonify({"status": "erro", "detalhe": "Filtro inválido"}), 400
+    entries, next_cursor = message_store.page(before=before, limit=limit, **filtros)
+    return jsonify({"entries": entries, "next_cursor": next_cursor})
+
+# Exportação do log filtrado (JSON lines), gerada aos poucos sem montar tudo em memória
+@app.route("/api/messages/export", methods=["GET"])
+def api_messages_export():
+    try:
+        filtros = _filtros_log(request.args)
+    except ValueError:
+        return jsonify({"status": "erro", "detalhe": "Filtro inválido"}), 400
+
+    def gerar():
+        for entry in message_store.iter_entries(**filtros):
+            yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=messages.jsonl"},
+    )
 
 # Endpoint do webhook do TextMeBot
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    data = request.get_json()
-    if data.get("event") != "message":
-        return f"Unknown event {data.get('event')}", 400
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or data.get("event") != "message":
+        event = data.get("event") if isinstance(data, dict) else None
+        descartes.drop("evento")
+        return f"Unknown event {event}", 400
 
-    payload = data.get("payload", {})
-    text = payload.get("body")
-    chat_id = payload.get("from")
-    message_id = payload.get("id")
-    participant = payload.get("participant")
+    payload = data.get("payload") or {}
+    chat_id = payload.get("from", "")
+    remetente = chat_id.split('@')[0]
+    mensagem_recebida = payload.get("body", "")
 
-    data=payload
-    
-    # Define o timestamp
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Registra o log de mensagem recebida (mesmo de números não autorizados)
-    # Cria uma entrada unificada
-    log_entry = {
-        "from": data.get("from", ""),
-        "from_name": data.get("pushName", "Desconhecido"),
-        "to": data.get("to", ""),
-        "type": data.get("type", ""),
-        "user_message": data.get("body", ""),
-        "assistant_response": "",  # Será preenchido abaixo
-        "timestamp": timestamp
-    }
+    # Caminho rápido: mensagem vazia ou remetente não autorizado não monta log,
+    # não imprime nem grava nada além de contar (lookup em memória)
+    if not mensagem_recebida:
+        motivo, resposta = "vazia", RESPOSTA_VAZIA
+    elif not contacts.is_authorized(remetente):
+        motivo, resposta = "nao_autorizado", RESPOSTA_NAO_AUTORIZADO
+    else:
+        motivo = None
+
+    if motivo:
+        omitidos = descartes.drop(motivo, remetente)
+        if omitidos is not None:
+            # Log amostrado: um por remetente a cada drop_log_interval segundos
+            registrar_log(entrada_log(payload, resposta, descartados=omitidos))
+        return jsonify({
+            "status": "ok",
+            "resposta": resposta,
+            "whatsapp": {"status": "ok", "detail": resposta}
+        }), 200
+
+    # Registra o log de mensagem recebida
+    log_entry = entrada_log(payload)
     print(log_entry)
-    
-    #if not data or "from" not in data or "message" not in data:
-    #    log_entry["assistant_response"] = "Dados inválidos."
-    #    with open(MESSAGES_LOG_FILE, "a") as f:
-    #        f.write(json.dumps(log_entry) + "\n")
-    #    return jsonify({"status": "erro", "detalhe": "Dados inválidos"}), 400
-    
-    remetente = data.get("from", "").split('@')[0]
-    mensagem_recebida = data.get("body", "")
-    from_name = data.get("pushName", "Desconhecido")
 
-    #print('from_name:',from_name)
-    
-    # Verifica se o remetente está na lista de contatos permitidos e se está habilitado
-    contact_entry = next((c for c in allowed_contacts if c["contact"] == remetente), None)
-    autorizado = contact_entry is not None and contact_entry["enabled"]
-    
-    if autorizado and config.get("enable_responses", "true") == "true" and mensagem_recebida:
-        print("autorizado")
-        send_seen(chat_id=chat_id, message_id=message_id, participant=participant)
-        
-        typing(chat_id, 3)
-        # Chama a função async para processar o LLM e obter a resposta
+    if config.get("enable_responses", "true") != "true":
+        log_entry["assistant_response"] = RESPOSTA_NAO_AUTORIZADO
+        registrar_log(log_entry)
+        return jsonify({
+            "status": "ok",
+            "resposta": RESPOSTA_NAO_AUTORIZADO,
+            "whatsapp": {"status": "ok", "detail": RESPOSTA_NAO_AUTORIZADO}
+        }), 200
 
-        resposta = responder_whatsapp(mensagem_recebida, from_name)
-        
-                # Envia a resposta de volta para o usuário
-        whatsapp_result = send_message(chat_id, f"🤖: {resposta}")
-        
-        #whatsapp_result = whatsapp(remetente, f"🤖: {resposta}")
-        
-        log_entry["assistant_response"] = resposta
+    print("autorizado")
+    # Responde ao WAHA imediatamente; o LLM roda em background
+    job = {
+        "chat_id": chat_id,
+        "message_id": payload.get("id"),
+        "participant": payload.get("participant"),
+        "mensagem": mensagem_recebida,
+        "from_name": payload.get("pushName", "Desconhecido"),
+        "log_entry": log_entry,
+    }
+    if not job_queue.submit(chat_id, job):
+        return jsonify({"status": "erro", "detalhe": "Fila cheia"}), 503, {"Retry-After": "5"}
+    # Visto + "digitando..." já no aceite, sem esperar a janela de debounce nem o
+    # limite: o usuário vê a reação na hora e só o modelo fica para depois
+    background.submit(waha.acknowledge(chat_id, job["message_id"], job["participant"]))
+    return jsonify({"status": "enfileirado"}), 202
 
-    elif not mensagem_recebida:
-        resposta = "mensagem texto vazia"
-        whatsapp_result = {"status": "ok", "detail": resposta}
-        log_entry["assistant_response"] = resposta    
-    
-    else:
-        resposta = "Respostas desabilitadas ou remetente não autorizado."
-        whatsapp_result = {"status": "ok", "detail": resposta}
-        log_entry["assistant_response"] = resposta
-    
-    # Registra a entrada unificada no log (cada linha é um JSON)
-    with open(MESSAGES_LOG_FILE, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
-    
+@app.route("/metrics", methods=["GET"])
+def metrics():
     return jsonify({
-        "status": "ok",
-        "resposta": resposta,
-        "whatsapp": whatsapp_result
-    }), 200
+        "job_queue": job_queue.stats(),
+        "mcp_pool": mcp_pool.stats(),
+        "historico": historico.stats(),
+        "log_writer": log_writer.stats(),
+        "descartes": descartes.stats(),
+        "limites": limitador.stats(),
+    })
 
 if __name__ == "__main__":
-    app.run(host="192.168.0.22", port=5000)
+    app.run(host="192.168.0.22", port=5000, threaded=True)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+DEFAULT_CONTACTS = [{"contact": "55191111111111", "name": "user-change", "enabled": True}]
+
+
+def normalize_number(value: str) -> str:
+    """'5519...@c.us', '+55 19 ...' e '5519...' viram a mesma chave (só dígitos)"""
+    return "".join(c for c in (value or "").split("@")[0] if c.isdigit())
+
+
+def parse_contacts(lines) -> list:
+    # Formato: número,nome,enabled (nome e enabled opcionais)
+    contacts = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            parts = line.split(",")
+            if len(parts) == 3:
+                contact = parts[0].strip()
+                name = parts[1].strip()
+                enabled = parts[2].strip().lower() == "true"
+                contacts.append({"contact": contact, "name": name, "enabled": enabled})
+            elif len(parts) == 2:
+                # Se só tem número e enabled, usamos o número como nome
+                contact = parts[0].strip()
+                enabled = parts[1].strip().lower() == "true"
+                contacts.append({"contact": contact, "name": contact, "enabled": enabled})
+            else:
+                contacts.append({"contact": line, "name": line, "enabled": True})
+    return contacts
+
+
+class ContactIndex:
+    """Contatos permitidos indexados por número normalizado.
+
+    A consulta é um dict lookup sobre um snapshot imutável (lista + índice),
+    trocado de uma vez quando o arquivo muda: leitores nunca esperam lock.
+    O mtime/tamanho do arquivo é conferido no máximo a cada `check_interval`
+    segundos, e só uma thread recarrega por vez (as outras seguem com o
+    snapshot anterior).
+    """
+
+    def __init__(self, path: str, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.reloads = 0
+        self._snapshot = ([], {}, None)  # (contatos, número -> contato, assinatura do arquivo)
+        self.reload()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _swap(self, contacts, signature):
+        index = {}
+        for contact in contacts:
+            index.setdefault(normalize_number(contact["contact"]), contact)
+        self._snapshot = (contacts, index, signature)
+
+    def _load(self):
+        # Chamado com _reload_lock
+        signature = self._signature()
+        if signature is None:
+            contacts = [dict(c) for c in DEFAULT_CONTACTS]
+        else:
+            with open(self.path, "r") as f:
+                contacts = parse_contacts(f)
+        self._swap(contacts, signature)
+        self.reloads += 1
+
+    def reload(self):
+        with self._reload_lock:
+            self._load()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._signature() == self._snapshot[2]:
+            return
+        # Se outra thread já está recarregando, segue com o snapshot atual
+        if self._reload_lock.acquire(blocking=False):
+            try:
+                self._load()
+            finally:
+                self._reload_lock.release()
+
+    def get(self, number: str):
+        """Contato do número (qualquer formato) ou None"""
+        self._maybe_reload()
+        return self._snapshot[1].get(normalize_number(number))
+
+    def is_authorized(self, number: str) -> bool:
+        contact = self.get(number)
+        return contact is not None and contact["enabled"]
+
+    def all(self) -> list:
+        self._maybe_reload()
+        return self._snapshot[0]
+
+    def save(self, contacts: list):
+        """Grava o arquivo (troca atômica) e já passa a usar a lista nova"""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            for c in contacts:
+                f.write(f"{c['contact']},{c.get('name', c['contact'])},{str(c['enabled']).lower()}\n")
+        os.replace(tmp, self.path)
+        with self._reload_lock:
+            self._swap(contacts, self._signature())
+
+    def __len__(self):
+        return len(self._snapshot[0])
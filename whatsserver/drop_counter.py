@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class DropCounter:
+    """Contagem do tráfego descartado no webhook (eventos, vazias, não autorizados).
+
+    drop() só incrementa contadores em memória; o log de cada remetente é
+    amostrado: o primeiro descarte é registrado e os seguintes, até passar
+    `log_interval` segundos, só somam em `suppressed`. Um flood de um número
+    vira uma linha por intervalo em vez de uma por mensagem. Guarda no máximo
+    `max_senders` remetentes (LRU).
+    """
+
+    def __init__(self, log_interval: float = 60.0, max_senders: int = 10000):
+        self.log_interval = log_interval
+        self.max_senders = max_senders
+        self._lock = threading.Lock()
+        self._senders = OrderedDict()  # remetente -> [último log, descartes desde então]
+        self.reasons = Counter()
+        self.top = Counter()
+        self.logged = 0
+        self.suppressed = 0
+
+    def drop(self, reason: str, sender: str = ""):
+        """Conta o descarte; devolve quantos foram omitidos desde o último log
+        quando este deve ser registrado, ou None quando não deve."""
+        now = time.monotonic()
+        with self._lock:
+            self.reasons[reason] += 1
+            if not sender:
+                return None
+            self.top[sender] += 1
+            state = self._senders.get(sender)
+            if state is None:
+                state = self._senders[sender] = [now, 0]
+                while len(self._senders) > self.max_senders:
+                    old, _ = self._senders.popitem(last=False)
+                    del self.top[old]
+            else:
+                self._senders.move_to_end(sender)
+                if now - state[0] < self.log_interval:
+                    state[1] += 1
+                    self.suppressed += 1
+                    return None
+            omitted, state[0], state[1] = state[1], now, 0
+            self.logged += 1
+            return omitted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "dropped": sum(self.reasons.values()),
+                "reasons": dict(self.reasons),
+                "logged": self.logged,
+                "suppressed": self.suppressed,
+                "senders": len(self._senders),
+                "top_senders": dict(self.top.most_common(5)),
+            }
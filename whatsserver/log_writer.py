@@ -0,0 +1,157 @@
+import asyncio
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+
+# Marcador de fim da fila (close)
+_CLOSE = object()
+
+
+class LogWriter:
+    """Escritor único do messages.log (e do banco indexado), rodando como task no loop.
+
+    write() só enfileira a entrada, de qualquer thread, sem I/O no caminho da
+    requisição. A task grava em lote: quando junta `batch_size` entradas ou
+    quando a mais antiga pendente passa de `flush_interval` segundos. Cada
+    lote vira um único append no arquivo (nenhuma linha se mistura com outra)
+    e um único insert no banco.
+
+    Ao passar de `max_bytes`, o arquivo atual é renomeado com o horário,
+    comprimido em .gz e só os `backups` segmentos mais novos são mantidos.
+
+    Depois do close() não há mais task: write() grava a entrada na hora, na
+    thread de quem chamou (respostas que terminam durante o shutdown).
+    """
+
+    def __init__(self, path: str, background, store=None, batch_size: int = 50,
+                 flush_interval: float = 1.0, max_bytes: int = 5 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.background = background
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = None
+        self._task = None
+        self._closed = False
+        self._late_lock = threading.Lock()
+        # Métricas
+        self.written = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.errors = 0
+        self.late = 0
+
+    def _start(self):
+        # Executado dentro do loop
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    def _enqueue(self, entry):
+        if self._closed:
+            # Chegou depois do marcador de fim: a task não volta a ser criada
+            self._write_late(entry)
+            return
+        self._start()
+        self._queue.put_nowait(entry)
+
+    def _write_late(self, entry):
+        with self._late_lock:
+            try:
+                self._write_batch([entry])
+                self.written += 1
+                self.late += 1
+            except Exception as e:
+                self.errors += 1
+                print("Erro ao gravar log:", e)
+
+    def write(self, entry: dict):
+        """Enfileira a entrada (não bloqueia; pode ser chamado de qualquer thread)"""
+        if self._closed:
+            # O loop pode já estar parando: grava direto
+            self._write_late(entry)
+        else:
+            self.background.call_soon(self._enqueue, entry)
+
+    async def _run(self):
+        closing = False
+        while not closing:
+            entry = await self._queue.get()
+            if entry is _CLOSE:
+                break
+            batch = [entry]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _CLOSE:
+                    closing = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        try:
+            await asyncio.to_thread(self._write_batch, batch)
+            self.written += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            self.errors += 1
+            print("Erro ao gravar log:", e)
+
+    def _write_batch(self, batch):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in batch))
+        if self.store is not None:
+            self.store.append_many(batch)
+        if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        segment = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.replace(self.path, segment)
+        with open(segment, "rb") as src, gzip.open(f"{segment}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(segment)
+        self.rotations += 1
+        # Nomes com data ordenam cronologicamente
+        for old in sorted(glob.glob(f"{glob.escape(self.path)}.*.gz"))[:-self.backups or None]:
+            os.remove(old)
+
+    async def close(self, timeout: float = 10):
+        """Grava o que ainda está na fila e encerra a task (hook de shutdown)"""
+        self._closed = True
+        if self._task is None:
+            return
+        # O marcador entra depois de tudo o que já foi enfileirado
+        self._queue.put_nowait(_CLOSE)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            print(f"Log: {self._queue.qsize()} entradas não gravadas no shutdown")
+            self.errors += self._queue.qsize()
+            self._task.cancel()
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "late": self.late,
+        }
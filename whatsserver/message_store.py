@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+# Campos de uma entrada do log unificado (mesmo formato do messages.log)
+FIELDS = ("from", "from_name", "to", "type", "user_message", "assistant_response", "timestamp")
+COLUMNS = ("sender", "from_name", "recipient", "type", "user_message", "assistant_response", "timestamp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender TEXT NOT NULL DEFAULT '',
+    from_name TEXT,
+    recipient TEXT,
+    type TEXT,
+    user_message TEXT,
+    assistant_response TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_sender_ts ON messages (sender, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_messages_sender_id ON messages (sender, id);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+INSERT = f"INSERT INTO messages ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def _row_to_entry(row) -> dict:
+    entry = {field: row[column] for field, column in zip(FIELDS, COLUMNS)}
+    entry["id"] = row["id"]
+    return entry
+
+
+def _entry_to_row(entry: dict) -> tuple:
+    return tuple(entry.get(field, "") for field in FIELDS)
+
+
+# Entradas antigas do log guardam só o número ("5511..."); o webhook usa o chat_id
+# ("5511...@c.us"). Grupos e listas já vêm com sufixo próprio
+_CHAT_KEY = "CASE WHEN instr(sender, '@') > 0 THEN sender ELSE sender || '@c.us' END"
+
+
+def _sender_forms(chat_id: str) -> tuple:
+    # Formas com que o chat pode estar gravado na coluna sender
+    if chat_id.endswith("@c.us"):
+        return chat_id, chat_id[:-len("@c.us")]
+    return chat_id, chat_id
+
+
+def _filters(contact: str = None, since: str = None, until: str = None):
+    """Cláusulas WHERE (e parâmetros) para contato e intervalo de datas.
+
+    O contato casa com e sem sufixo ("5519..." e "5519...@c.us"); datas
+    aceitam "AAAA-MM-DD" ou "AAAA-MM-DD HH:MM:SS", e `until` só com a data
+    inclui o dia inteiro.
+    """
+    clauses, params = [], []
+    if contact:
+        number = contact.split("@")[0]
+        clauses.append("sender IN (?, ?)")
+        params += [number, f"{number}@c.us"]
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp <= ?")
+        params.append(f"{until} 23:59:59" if len(until) == 10 else until)
+    return clauses, params
+
+
+class MessageStore:
+    """Histórico de mensagens em SQLite com índice por (remetente, timestamp).
+
+    Ler as últimas N mensagens de um chat não depende do tamanho do log.
+    Cada thread usa a sua própria conexão (Flask e o event loop acessam juntos).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, entry: dict):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        with self._conn() as conn:
+            conn.executemany(INSERT, [_entry_to_row(entry) for entry in entries])
+
+    def last_for(self, chat_id: str, n: int = 5, exclude_responses=()) -> list:
+        """Últimas n entradas de um chat, da mais antiga para a mais nova.
+
+        Aceita o chat_id do webhook e também acha as entradas gravadas só com
+        o número.
+
+        `exclude_responses` descarta entradas cuja resposta seja uma dessas
+        (ex.: respostas internas de mensagem vazia ou não autorizada).
+        """
+        exclude = tuple(exclude_responses)
+        filtro = f" AND assistant_response NOT IN ({', '.join('?' * len(exclude))})" if exclude else ""
+        rows = self._conn().execute(
+            f"SELECT * FROM messages WHERE sender IN (?, ?){filtro} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*_sender_forms(chat_id), *exclude, n),
+        ).fetchall()
+        return [_row_to_entry(row) for row in reversed(rows)]
+
+    def recent_senders(self, n: int = 100) -> list:
+        """chat_ids com atividade mais recente, do mais novo para o mais antigo
+        (número puro e número@c.us contam como o mesmo chat)"""
+        rows = self._conn().execute(
+            f"SELECT {_CHAT_KEY} AS chat_id FROM messages GROUP BY chat_id ORDER BY MAX(id) DESC LIMIT ?", (n,)
+        ).fetchall()
+        return [row["chat_id"] for row in rows]
+
+    def recent(self, n: int = 5) -> list:
+        """Últimas n entradas de qualquer remetente, da mais antiga para a mais nova"""
+        rows = self._conn().execute("SELECT * FROM messages ORDER BY id DESC LIMIT ?", (n,)).fetchall()
+        return [_row_to_entry(row) for row in reversed(rows)]
+
+    def page(self, before: int = None, limit: int = 50, contact: str = None, since: str = None, until: str = None) -> tuple:
+        """Uma página, da mais nova para a mais antiga, e o cursor da próxima.
+
+        `before` é o id da última entrada da página anterior (cursor); o
+        cursor devolvido é None quando não há mais entradas.
+        """
+        clauses, params = _filters(contact, since, until)
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT * FROM messages{where} ORDER BY id DESC LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+        entries = [_row_to_entry(row) for row in rows[:limit]]
+        return entries, (entries[-1]["id"] if len(rows) > limit else None)
+
+    def iter_entries(self, contact: str = None, since: str = None, until: str = None, chunk: int = 500):
+        """Todas as entradas do filtro, da mais antiga para a mais nova, lidas em blocos"""
+        clauses, params = _filters(contact, since, until)
+        after = 0
+        while True:
+            where = " AND ".join(clauses + ["id > ?"])
+            rows = self._conn().execute(
+                f"SELECT * FROM messages WHERE {where} ORDER BY id LIMIT ?", (*params, after, chunk)
+            ).fetchall()
+            for row in rows:
+                yield _row_to_entry(row)
+            if len(rows) < chunk:
+                return
+            after = rows[-1]["id"]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def import_jsonl(self, log_path: str, force: bool = False) -> int:
+        """Migração do messages.log (JSON por linha) para o banco.
+
+        Roda uma única vez por arquivo (fica marcado na tabela meta), numa só
+        transação, para não duplicar entradas. Retorna quantas importou.
+        """
+        if not os.path.exists(log_path):
+            return 0
+        key = f"migrated:{os.path.abspath(log_path)}"
+        conn = self._conn()
+        if not force and conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return 0
+
+        rows = []
+        with open(log_path, "r") as f:
+            for line in f:
+                try:
+                    rows.append(_entry_to_row(json.loads(line)))
+                except Exception as e:
+                    print("Erro ao parsear linha do log:", e)
+        with conn:
+            conn.executemany(INSERT, rows)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(len(rows))))
+        return len(rows)
+
+
+if __name__ == "__main__":
+    # Migração manual: python message_store.py messages.log [messages.db]
+    if len(sys.argv) < 2:
+        print("uso: python message_store.py <messages.log> [messages.db]")
+        sys.exit(1)
+    store = MessageStore(sys.argv[2] if len(sys.argv) > 2 else "messages.db")
+    print(f"{store.import_jsonl(sys.argv[1])} entradas importadas ({store.count()} no total)")
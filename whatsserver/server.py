@@ -1,78 +1,77 @@
 #mcp server.py
 from mcp.server.fastmcp import FastMCP
+import asyncio
 import httpx
 import os
+import sys
 from dotenv import load_dotenv
 import json
 from collections import defaultdict
-import requests
+
+# Módulos compartilhados ficam em src/server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "server"))
+import weather
+from http_client import get_client, lifespan
+from waha import WAHA_SESSION, WAHA_URL
 
 load_dotenv()
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-#create server
-mcp = FastMCP("mcp_server_pi")
+# Envio pelo WAHA: timeout curto e limite de envios simultâneos no sendwhats_many
+SEND_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+SEND_CONCURRENCY = int(os.getenv("SENDWHATS_CONCURRENCY", "5"))
+
+#create server (o lifespan abre e fecha o cliente HTTP compartilhado pelas ferramentas)
+mcp = FastMCP("mcp_server_pi", lifespan=lifespan)
 
 @mcp.tool()
 async def fetch_weather(city: str) -> str:
     """Fetch current weather for a city"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"https://api.openweathermap.org/data/2.5/weather?q={city}&APPID={OPENWEATHER_API_KEY}&units=metric")
-        result = response.text
-        weather_data = json.loads(result)
-        current_weather = (
-            f"Agora em {city.capitalize()}: {weather_data['main']['temp']}°C, "
-            f"{weather_data['weather'][0]['description'].capitalize()}, "
-            f"umidade de {weather_data['main']['humidity']}% e vento de {weather_data['wind']['speed']} m/s."
-        )
-        
-        return current_weather
+    weather_data = await weather.current(city)
+    current_weather = (
+        f"Agora em {city.capitalize()}: {weather_data['main']['temp']}°C, "
+        f"{weather_data['weather'][0]['description'].capitalize()}, "
+        f"umidade de {weather_data['main']['humidity']}% e vento de {weather_data['wind']['speed']} m/s."
+    )
+    
+    return current_weather
 
 
 @mcp.tool()
 async def fetch_forecast(city: str, days: int) -> str:
     """Fetch current weather for a city"""
-    async with httpx.AsyncClient() as client:
-        # Calcula o cnt necessário (8 previsões a cada dia, com intervalos de 3h)
-        cnt = days * 8
-        
-        response = await client.get(f"https://api.openweathermap.org/data/2.5/forecast?q={city}&cnt={cnt}&APPID={OPENWEATHER_API_KEY}&units=metric")
-        result = response.text
-
-        forecast_data = json.loads(result)
-        forecast_list = forecast_data.get('list', [])
+    # 8 previsões a cada dia, com intervalos de 3h
+    forecast_data = await weather.forecast(city, days)
+    forecast_list = forecast_data.get('list', [])
+    
+    if forecast_list:
+        # Agrupa as previsões por data (YYYY-MM-DD)
+        daily_temps = defaultdict(list)
+        for forecast in forecast_list:
+            dt_txt = forecast.get('dt_txt', '')
+            date = dt_txt.split(" ")[0] if dt_txt else "Data desconhecida"
+            temp_min = forecast['main']['temp_min']
+            temp_max = forecast['main']['temp_max']
+            daily_temps[date].append((temp_min, temp_max))
         
-        if forecast_list:
-            # Agrupa as previsões por data (YYYY-MM-DD)
-            daily_temps = defaultdict(list)
-            for forecast in forecast_list:
-                dt_txt = forecast.get('dt_txt', '')
-                date = dt_txt.split(" ")[0] if dt_txt else "Data desconhecida"
-                temp_min = forecast['main']['temp_min']
-                temp_max = forecast['main']['temp_max']
-                daily_temps[date].append((temp_min, temp_max))
-            
-            daily_summary = []
-            # Ordena as datas e calcula, para cada dia, o mínimo e máximo
-            for date in sorted(daily_temps.keys()):
-                temps = daily_temps[date]
-                day_min = min(t[0] for t in temps)
-                day_max = max(t[1] for t in temps)
-                daily_summary.append(f"{date}: Mín {day_min}°C, Máx {day_max}°C")
-                
-            forecast_summary = (
-                f"Previsão para {city.capitalize()} para os próximos {days} dia(s): " +
-                "; ".join(daily_summary) + "."
-            )
-            #print(forecast_summary)
-        else:
-            print("Não foi possível obter a previsão do tempo.")
+        daily_summary = []
+        # Ordena as datas e calcula, para cada dia, o mínimo e máximo
+        for date in sorted(daily_temps.keys()):
+            temps = daily_temps[date]
+            day_min = min(t[0] for t in temps)
+            day_max = max(t[1] for t in temps)
+            daily_summary.append(f"{date}: Mín {day_min}°C, Máx {day_max}°C")
             
-        return forecast_summary
+        forecast_summary = (
+            f"Previsão para {city.capitalize()} para os próximos {days} dia(s): " +
+            "; ".join(daily_summary) + "."
+        )
+        #print(forecast_summary)
+    else:
+        print("Não foi possível obter a previsão do tempo.")
+        
+    return forecast_summary
     
-@mcp.tool()
-async def sendwhats(msg: str, num: str) -> str:
-    url = "http://localhost:3000/api/sendText"
+async def _send_text(msg: str, num: str) -> dict:
     headers = {
         "Accept": "application/json",
         "Content-Type": "application/json"
@@ -80,16 +79,43 @@ async def sendwhats(msg: str, num: str) -> str:
     data = {
         "chatId": f"{num}@c.us",
         "text": msg,
-        "session": "default"
+        "session": WAHA_SESSION
     }
 
-    response = requests.post(url, json=data, headers=headers)
-    print(response.json())
-    
+    response = await get_client().post(f"{WAHA_URL}/api/sendText", json=data, headers=headers, timeout=SEND_TIMEOUT)
+    response.raise_for_status()
     return response.json()
-    
+
+@mcp.tool()
+async def sendwhats(msg: str, num: str) -> str:
+    """Send a WhatsApp message to a number"""
+    return json.dumps(await _send_text(msg, num))
+
+@mcp.tool()
+async def sendwhats_many(msg: str, nums: list[str], concurrency: int = SEND_CONCURRENCY) -> str:
+    """Send the same WhatsApp message to many numbers concurrently and report per-recipient status"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def enviar(num):
+        async with semaphore:
+            try:
+                result = await _send_text(msg, num)
+                return num, {"status": "ok", "id": result.get("id") if isinstance(result, dict) else None}
+            except httpx.HTTPStatusError as e:
+                return num, {"status": "erro", "detalhe": f"HTTP {e.response.status_code}"}
+            except Exception as e:
+                return num, {"status": "erro", "detalhe": str(e) or type(e).__name__}
+
+    results = dict(await asyncio.gather(*(enviar(num) for num in dict.fromkeys(nums))))
+    return json.dumps(results)
+
 
 
+# Contadores do cache de clima (hits/misses/evicções/buscas coalescidas)
+@mcp.resource("cache://weather/stats")
+def weather_cache_stats() -> str:
+    """Weather cache hit/miss counters"""
+    return json.dumps(weather.stats())
 
 # Add a dynamic greeting resource
 @mcp.resource("greeting://{name}")
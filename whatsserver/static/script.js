@@ -1,5 +1,101 @@
 // static/script.js
-// Exemplo: futuras interações JavaScript
+// Log de mensagens: carrega as mais novas por páginas (/api/messages) conforme a rolagem
 document.addEventListener("DOMContentLoaded", function() {
-    // Seu código JS aqui (se necessário)
+    const list = document.getElementById("log-entries");
+    if (!list) {
+        return;
+    }
+    const moreButton = document.getElementById("log-more");
+    const filtersForm = document.getElementById("log-filters");
+    const exportLink = document.getElementById("log-export");
+    const exportUrl = exportLink.getAttribute("href");
+
+    let cursor = null;
+    let loading = false;
+    let done = false;
+    // Evita que uma resposta de um filtro antigo apareça depois de trocar o filtro
+    let generation = 0;
+
+    function filterParams() {
+        const params = new URLSearchParams();
+        for (const [name, value] of new FormData(filtersForm)) {
+            if (value.trim()) {
+                params.set(name, value.trim());
+            }
+        }
+        return params;
+    }
+
+    function render(entries) {
+        const fragment = document.createDocumentFragment();
+        for (const entry of entries) {
+            const pre = document.createElement("pre");
+            pre.textContent = JSON.stringify(entry, null, 2);
+            fragment.appendChild(pre);
+        }
+        list.appendChild(fragment);
+    }
+
+    async function loadMore() {
+        if (loading || done) {
+            return;
+        }
+        loading = true;
+        const current = generation;
+        const params = filterParams();
+        params.set("limit", list.dataset.pageSize);
+        if (cursor !== null) {
+            params.set("before", cursor);
+        }
+        try {
+            const response = await fetch(list.dataset.api + "?" + params.toString());
+            const data = await response.json();
+            if (current !== generation) {
+                return;
+            }
+            if (!response.ok) {
+                list.textContent = data.detalhe || "Erro ao carregar o log.";
+                done = true;
+                return;
+            }
+            render(data.entries);
+            cursor = data.next_cursor;
+            done = cursor === null;
+            if (done && !list.childElementCount) {
+                list.textContent = "Nenhuma mensagem registrada.";
+            }
+        } catch (e) {
+            list.textContent = "Erro ao carregar o log.";
+        } finally {
+            if (current === generation) {
+                loading = false;
+                moreButton.style.display = done ? "none" : "block";
+            }
+        }
+    }
+
+    function reset() {
+        generation += 1;
+        cursor = null;
+        loading = false;
+        done = false;
+        list.textContent = "";
+        const params = filterParams().toString();
+        exportLink.setAttribute("href", params ? exportUrl + "?" + params : exportUrl);
+        loadMore();
+    }
+
+    filtersForm.addEventListener("submit", function(event) {
+        event.preventDefault();
+        reset();
+    });
+    moreButton.addEventListener("click", loadMore);
+    // Próxima página quando a rolagem chega perto do fim da lista
+    list.addEventListener("scroll", function() {
+        if (list.scrollTop + list.clientHeight >= list.scrollHeight - 50) {
+            loadMore();
+        }
+    });
+
+    reset();
 });